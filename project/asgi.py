@@ -0,0 +1,17 @@
+"""
+ASGI config for project project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.2 has no ASGI handler of its own, so the WSGI application is run on
+asgiref's thread pool, e.g. ``uvicorn project.asgi:application``.
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
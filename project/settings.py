@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import importlib.util
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,14 +76,104 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# Backend for the dashboard data: 'sqlite' or 'postgresql' ('postgresql' requires psycopg2 and the DATABASE_* environment variables)
+DATABASE_BACKEND = 'sqlite'
+
+# Seconds a worker keeps its database connection open across requests; 0 closes it after every request
+DATABASE_CONN_MAX_AGE = 60
+
 DATABASES = {
     'default': {
+        'sqlite': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Seconds a connection waits for a lock held by another one, such as an import
+                'timeout': 20,
+            },
+        },
+        'postgresql': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'shineanalytics'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        },
+    }[DATABASE_BACKEND],
+}
+
+# Read-only copy of the SQLite database that the dashboards read, published atomically after every import;
+# None reads the primary. Replica connections close after each request so they open the latest copy
+DATABASE_REPLICA = os.path.join(BASE_DIR, 'db-replica.sqlite3')
+
+if DATABASE_BACKEND == 'sqlite' and DATABASE_REPLICA:
+    DATABASES['replica'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': 'file:{}?mode=ro'.format(DATABASE_REPLICA),
+        'CONN_MAX_AGE': 0,
+        'TEST': {
+            'MIRROR': 'default',
+        },
     }
+
+DATABASE_ROUTERS = ['web.routers.ReplicaRouter']
+
+# Pragmas run on every new SQLite connection: WAL lets dashboards read while an import writes,
+# and memory-mapped I/O and a larger page cache let concurrent readers share the file pages
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+# Backend for cached chart outputs: 'locmem', 'file' or 'db' ('db' requires `manage.py createcachetable`)
+CHART_CACHE_BACKEND = 'locmem'
+
+CACHES = {
+    'default': {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'charts',
+            'TIMEOUT': None,
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache'),
+            'TIMEOUT': None,
+        },
+        'db': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'web_cache',
+            'TIMEOUT': None,
+        },
+    }[CHART_CACHE_BACKEND],
+}
+
+
+# Charts
+
+# Number of threads building the charts of a dashboard concurrently; 1 builds them one after another
+CHART_WORKERS = 4
+
+# Seconds to wait for a chart before rendering a placeholder in its place
+CHART_TIMEOUT = 30
+
+# Render the dashboard shell first and let the browser fetch each chart as JSON
+CHART_LAZY_LOADING = True
+
+# Deployed revision, part of the dashboard and chart ETags; when empty, a digest of the web app's code and templates is used
+RELEASE = os.environ.get('RELEASE', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -122,6 +214,11 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = "/var/www/shineanalytics.online/static/"
 
+# BokehJS is collected from the installed bokeh package, so it always matches the Python side
+STATICFILES_DIRS = [
+    ('bokeh', os.path.join(importlib.util.find_spec('bokeh').submodule_search_locations[0], 'server', 'static')),
+]
+
 # Authentication
 # https://docs.djangoproject.com/en/2.1/topics/auth/default/#module-django.contrib.auth.views
 
@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_migrate, post_save, pre_delete
 
 
 class WebConfig(AppConfig):
     name = 'web'
+
+    def ready(self):
+        from django.contrib.auth.models import Group, User
+        from web.database import configure_sqlite, replica_migrated
+        from web.registry import check
+        from web.roles import group_changed, membership_changed
+        check()
+        connection_created.connect(configure_sqlite, dispatch_uid='web.configure_sqlite')
+        post_migrate.connect(replica_migrated, sender=self, dispatch_uid='web.replica_migrated')
+        m2m_changed.connect(membership_changed, sender=User.groups.through, dispatch_uid='web.membership_changed')
+        post_save.connect(group_changed, sender=Group, dispatch_uid='web.group_saved')
+        pre_delete.connect(group_changed, sender=Group, dispatch_uid='web.group_deleted')
@@ -0,0 +1,88 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from web.models import DataVersion
+from web.columns import Columns
+from web.timing import activated, active, measure
+
+logger = logging.getLogger(__name__)
+
+# Placeholder rendered in place of a chart that did not finish within CHART_TIMEOUT
+unavailable = ('', '<p class="has-text-grey">This chart is taking longer than usual to load.</p>')
+
+# Thread pool shared by every render in this process, created on first use
+executor = None
+executor_lock = threading.Lock()
+
+def data_version():
+    """Returns the current data version stamp"""
+    version = DataVersion.objects.filter(pk=1).values_list('stamp', flat=True).first()
+    return version or 0
+
+def bump_data_version():
+    """Increments the data version stamp, invalidating every cached chart output"""
+    if not DataVersion.objects.filter(pk=1).update(stamp=F('stamp') + 1, updated=timezone.now()):
+        DataVersion.objects.create(pk=1, stamp=1)
+
+def cached_values(name, rows, version=None):
+    """Returns the rows produced by a function as columns, reusing the cached columns for the current data version"""
+    key = 'columns:{}:{}'.format(data_version() if version is None else version, name)
+    return cache.get_or_set(key, lambda: Columns.fetch(rows()), None)
+
+def plot_components(plot, version, datasets=None):
+    """Returns the script and div of a plot function, reusing the cached components of the plot for the same filter"""
+    from bokeh.embed import components
+    key = 'components:{}:{}?{}'.format(version, plot.__name__, datasets.filters.key if datasets else '')
+    return cache.get_or_set(key, lambda: measure(plot, datasets, components), None)
+
+def cached_json_item(plot, datasets=None):
+    """Returns the JSON item of a plot function for embedding with Bokeh.embed.embed_item, reusing the cached item of the plot for the same filter"""
+    from bokeh.embed import json_item
+    key = 'json:{}:{}?{}'.format(data_version(), plot.__name__, datasets.filters.key if datasets else '')
+    return cache.get_or_set(key, lambda: measure(plot, datasets, json_item), None)
+
+def threaded_plot_components(plot, version, datasets=None, timings=None):
+    """Returns the components of a plot function from a pool thread, closing the thread's connections afterwards unless CONN_MAX_AGE keeps them"""
+    try:
+        with activated(timings):
+            return plot_components(plot, version, datasets)
+    finally:
+        close_old_connections()
+
+def get_executor():
+    """Returns the chart thread pool, creating it with CHART_WORKERS threads on first use"""
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=settings.CHART_WORKERS, thread_name_prefix='chart')
+        return executor
+
+def cached_components(plots, datasets=None):
+    """Returns the script and divs for a dictionary of plot functions, reusing the cached components of each plot
+
+    With CHART_WORKERS above 1 the plots are built concurrently, and any plot
+    still running after CHART_TIMEOUT seconds is replaced by a placeholder.
+    """
+    version = data_version()
+    if settings.CHART_WORKERS > 1 and len(plots) > 1:
+        deadline = time.monotonic() + settings.CHART_TIMEOUT
+        futures = {name: get_executor().submit(threaded_plot_components, plot, version, datasets, active()) for name, plot in plots.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except TimeoutError:
+                logger.warning("%s did not finish within %s seconds", plots[name].__name__, settings.CHART_TIMEOUT)
+                results[name] = unavailable
+    else:
+        results = {name: plot_components(plot, version, datasets) for name, plot in plots.items()}
+
+    scripts = [script for script, div in results.values()]
+    divs = {name: div for name, (script, div) in results.items()}
+    return "\n".join(scripts), divs
@@ -1,93 +1,34 @@
 import math
-import itertools
-import collections
-from dateutil.relativedelta import relativedelta
+import numpy as np
 from bokeh.plotting import figure
 from bokeh.core.properties import value
-from bokeh.io import show, output_file
 from bokeh.models import ColumnDataSource, NumeralTickFormatter
 from bokeh.palettes import all_palettes
-from bokeh.transform import dodge, factor_cmap
-from django.db.models.functions import TruncMonth, TruncQuarter, TruncYear
-from django.db.models import Sum, Count, F, Q
-from web.models import *
+from bokeh.transform import factor_cmap
+from web.datasets import Datasets
+from web.registry import title
 
 # Globals
 tools = "pan,wheel_zoom,box_zoom,reset,save"
 
-def top_ten_accounts_receivables_balance_by_customer():
-    """Returns plot for the top ten accounts receivables balance by customer"""
-
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .values('project__custaccount__customer__name')
-        .annotate(inflow=Sum('converted_amount', filter=Q(document__reference__startswith='I')), outflow=Sum('converted_amount', filter=Q(document__reference__startswith='B')), variance=F('inflow')+F('outflow'), transactions=Count('converted_amount', filter=Q(document__reference__startswith='I')))
-        .exclude(variance__isnull=True)
-        .order_by('-variance')[:10]
-    )
-
-    # Creating lists from Queryset
-    customers = [i['project__custaccount__customer__name'] for i in query]
-    custshort = ["".join([word[:1] for word in customer.split(' ')]) for customer in customers]
-    transactions = [i['transactions'] for i in query]
-    inflow = [i['inflow'] for i in query]
-    outflow = [i['outflow'] for i in query]
-    variance = [i['variance'] for i in query]
-
-    # Create ColumnDataSource
-    data = dict(
-        customers=customers,
-        custshort=custshort,
-        variance=variance,
-        inflow=inflow,
-        outflow=outflow,
-    )
-    source = ColumnDataSource(data=data)
+def _palette(n):
+    """Returns n colours for stacked years, as filtered charts may show fewer years than the smallest palette"""
+    return all_palettes['Category20c'][max(n, 3)][:n]
 
-    # Create plot
-    p = figure(
-        title="Top 10 AR Balance by Customer",
-        x_range=custshort,
-        tools=tools,
-        x_axis_label='customers',
-        y_axis_label='net accounts receivables',
-        tooltips=[
-            ("Customer", "@customers"),
-            ("Net Revenue", "@inflow{$0,0.00}"),
-            ("Net Repayment", "@outflow{$0,0.00}"),
-            ("Variance", "@variance{$0,0.00}"),
-        ],
-        height=320,
-    )
-    p.vbar(x='custshort', top='variance', width=0.9, source=source, fill_color='green', fill_alpha=0.3, line_color='white')
-    p.xgrid.grid_line_color = None
-    p.sizing_mode = 'scale_width'
-    p.yaxis.formatter = NumeralTickFormatter(format='$0a')
+def top_ten_accounts_receivables_balance_by_customer(datasets=None, filters=None):
+    """Returns plot for the top ten accounts receivables balance by customer"""
 
-    return p
+    datasets = datasets or Datasets(filters)
 
-def bottom_ten_accounts_receivables_balance_by_customer():
-    """Returns plot for the bottom ten accounts receivables balance by customer"""
-
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .values('project__custaccount__customer__name')
-        .annotate(inflow=Sum('converted_amount', filter=Q(document__reference__startswith='I')), outflow=Sum('converted_amount', filter=Q(document__reference__startswith='B')), variance=F('inflow')+F('outflow'), transactions=Count('converted_amount', filter=Q(document__reference__startswith='I')))
-        .exclude(variance__isnull=True)
-        .order_by('variance')[:10]
-    )
+    # Dataset
+    query = datasets.get('customer_receivables')[:10]
 
-    # Creating lists from Queryset
-    customers = [i['project__custaccount__customer__name'] for i in query]
+    # Creating columns from Dataset
+    customers = query['customer__name'].tolist()
     custshort = ["".join([word[:1] for word in customer.split(' ')]) for customer in customers]
-    transactions = [i['transactions'] for i in query]
-    inflow = [i['inflow'] for i in query]
-    outflow = [i['outflow'] for i in query]
-    variance = [i['variance'] for i in query]
+    inflow = query['invoiced']
+    outflow = -query['collected']
+    variance = query['closing']
 
     # Create ColumnDataSource
     data = dict(
@@ -101,7 +42,7 @@ def bottom_ten_accounts_receivables_balance_by_customer():
 
     # Create plot
     p = figure(
-        title="Bottom 10 AR Balance by Customer",
+        title=title('top_ten_accounts_receivables_balance_by_customer'),
         x_range=custshort,
         tools=tools,
         x_axis_label='customers',
@@ -114,31 +55,25 @@ def bottom_ten_accounts_receivables_balance_by_customer():
         ],
         height=320,
     )
-    p.vbar(x='custshort', top='variance', width=0.9, source=source, fill_color='red', fill_alpha=0.3, line_color='white')
+    p.vbar(x='custshort', top='variance', width=0.9, source=source, fill_color='green', fill_alpha=0.3, line_color='white')
     p.xgrid.grid_line_color = None
     p.sizing_mode = 'scale_width'
     p.yaxis.formatter = NumeralTickFormatter(format='$0a')
 
     return p
 
-def income_by_location():
+def income_by_location(datasets=None, filters=None):
     """Returns plot for income by location"""
 
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .filter(document__reference__startswith='I')
-        .annotate(year=TruncYear('document__date'))
-        .values('year', 'location__code')
-        .annotate(total=Sum('converted_amount'))
-        .order_by('-year')
-    )
+    datasets = datasets or Datasets(filters)
 
-    # Creating lists from Queryset
-    locations = list(collections.OrderedDict.fromkeys([i['location__code'] for i in query]))
-    years = list(collections.OrderedDict.fromkeys([i['year'].strftime("%Y") for i in query]))
-    revenue = {year: [i['total'] for i in query if i['year'].strftime("%Y") == year] for year in years}
+    # Dataset
+    query = datasets.get('location_income_by_year')
+
+    # Creating columns from Dataset, pivoted to one revenue column per year
+    locations, years, revenue = query.pivot('location__code', 'year', 'total')
+    years = [year.strftime("%Y") for year in years]
+    revenue = dict(zip(years, revenue))
 
     # Create ColumnDataSource
     data = dict(
@@ -149,7 +84,7 @@ def income_by_location():
 
     # Create plot
     p = figure(
-        title="Revenue By Location Per Year",
+        title=title('income_by_location'),
         x_range=locations,
         tools=tools,
         x_axis_label='locations',
@@ -162,7 +97,7 @@ def income_by_location():
         height=320,
     )
 
-    p.vbar_stack(years, x='locations', width=0.9, color=all_palettes['Category20c'][len(years)], source=source, legend=[value(x) for x in years])
+    p.vbar_stack(years, x='locations', width=0.9, color=_palette(len(years)), source=source, legend=[value(x) for x in years])
     p.y_range.start = 0
     p.x_range.range_padding = 0.1
     p.xgrid.grid_line_color = None
@@ -175,24 +110,18 @@ def income_by_location():
 
     return p
 
-def income_by_project_per_year():
+def income_by_project_per_year(datasets=None, filters=None):
     """Returns plot for income by project"""
 
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .filter(document__reference__startswith='I')
-        .annotate(month=TruncMonth('document__date'))
-        .values('month', 'project__code')
-        .annotate(total=Sum('converted_amount'))
-        .order_by()
-    )
+    datasets = datasets or Datasets(filters)
 
-    # Creating lists from Queryset
-    projects = [i['project__code'] for i in query]
-    months = [i['month'] for i in query]
-    revenue = [i['total'] for i in query]
+    # Dataset
+    query = datasets.get('project_income_by_month')
+
+    # Creating columns from Dataset
+    projects = query['project__code']
+    months = query['month']
+    revenue = query['total']
     data = dict(
         projects=projects,
         months=months,
@@ -202,7 +131,7 @@ def income_by_project_per_year():
     
 
     p = figure(
-        title="Revenue By Projects Per Month",
+        title=title('income_by_project_per_year'),
         tools=tools,
         x_axis_type='datetime',
         x_axis_label='month/year',
@@ -222,24 +151,18 @@ def income_by_project_per_year():
 
     return p
 
-def revenue_by_salesperson_per_year():
+def revenue_by_salesperson_per_year(datasets=None, filters=None):
     """Returns plot for revenue by salesperson per year"""
-    
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .filter(document__reference__startswith='I')
-        .annotate(year=TruncYear('document__date'))
-        .values('year', 'project__salesperson__name')
-        .annotate(total=Sum('converted_amount'))
-        .order_by('-year')
-    )
 
-    # Creating lists from Queryset
-    salespersons = list(collections.OrderedDict.fromkeys([i['project__salesperson__name'] for i in query]))
-    years = list(collections.OrderedDict.fromkeys([i['year'].strftime("%Y") for i in query]))
-    revenue = {year: [i['total'] for i in query if i['year'].strftime("%Y") == year] for year in years}
+    datasets = datasets or Datasets(filters)
+
+    # Dataset
+    query = datasets.get('salesperson_income_by_year')
+
+    # Creating columns from Dataset, pivoted to one revenue column per year
+    salespersons, years, revenue = query.pivot('salesperson__name', 'year', 'total')
+    years = [year.strftime("%Y") for year in years]
+    revenue = dict(zip(years, revenue))
 
     # Create ColumnDataSource
     data = dict(
@@ -250,7 +173,7 @@ def revenue_by_salesperson_per_year():
 
     # Create plot
     p = figure(
-        title="Revenue By Salesperson Per Year",
+        title=title('revenue_by_salesperson_per_year'),
         x_range=salespersons,
         tools=tools,
         x_axis_label='salespersons',
@@ -263,7 +186,7 @@ def revenue_by_salesperson_per_year():
         height=320,
     )
 
-    p.vbar_stack(years, x='salespersons', width=0.9, color=all_palettes['Category20c'][len(years)], source=source, legend=[value(x) for x in years])
+    p.vbar_stack(years, x='salespersons', width=0.9, color=_palette(len(years)), source=source, legend=[value(x) for x in years])
     p.y_range.start = 0
     p.x_range.range_padding = 0.1
     p.xgrid.grid_line_color = None
@@ -276,26 +199,20 @@ def revenue_by_salesperson_per_year():
 
     return p
 
-def accounts_receivables_turnover_by_month():
+def accounts_receivables_turnover_by_month(datasets=None, filters=None):
     """Returns plot for the cumulative net accounts receivables turnover by month"""
 
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .annotate(month=TruncMonth('document__date'))
-        .values('month')
-        .annotate(inflow=Sum('converted_amount', filter=Q(document__reference__startswith='I')), outflow=Sum('converted_amount', filter=Q(document__reference__startswith='B')), variance=F('inflow')+F('outflow'))
-        .exclude(variance__isnull=True)
-        .order_by('month')
-    )
+    datasets = datasets or Datasets(filters)
+
+    # Dataset
+    query = datasets.get('receivables_by_month')
 
-    # Creating lists from Queryset
-    month = [i['month'].strftime("%b '%y") for i in query]
-    inflow = [i['inflow'] for i in query]
-    variance = [i['variance'] for i in query]
-    cumvar = [i for i in itertools.accumulate(variance)]
-    turnover = [i/c for c, i in zip(cumvar, inflow)]
+    # Creating columns from Dataset
+    month = [i.strftime("%b '%y") for i in query['month']]
+    inflow = query['invoiced']
+    variance = query['invoiced'] - query['collected']
+    cumvar = query['closing']
+    turnover = inflow / cumvar
 
     # Create ColumnDataSource
     data = dict(
@@ -309,7 +226,7 @@ def accounts_receivables_turnover_by_month():
 
     # Create plot
     p = figure(
-        title="Accounts Receivables Turnover by Month",
+        title=title('accounts_receivables_turnover_by_month'),
         x_range=month,
         tools=tools,
         x_axis_label='month/year',
@@ -330,26 +247,20 @@ def accounts_receivables_turnover_by_month():
 
     return p
 
-def accounts_receivables_balance_by_month():
+def accounts_receivables_balance_by_month(datasets=None, filters=None):
     """Returns plot for the cumulative net accounts receivables balance by month"""
 
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .annotate(month=TruncMonth('document__date'))
-        .values('month')
-        .annotate(inflow=Sum('converted_amount', filter=Q(document__reference__startswith='I')), outflow=Sum('converted_amount', filter=Q(document__reference__startswith='B')), variance=F('inflow')+F('outflow'))
-        .exclude(variance__isnull=True)
-        .order_by('month')
-    )
+    datasets = datasets or Datasets(filters)
+
+    # Dataset
+    query = datasets.get('receivables_by_month')
 
-    # Creating lists from Queryset
-    month = [i['month'].strftime("%b '%y") for i in query]
-    inflow = [i['inflow'] for i in query]
-    outflow = [i['outflow'] for i in query]
-    variance = [i['variance'] for i in query]
-    cumvar = [i for i in itertools.accumulate(variance)]
+    # Creating columns from Dataset
+    month = [i.strftime("%b '%y") for i in query['month']]
+    inflow = query['invoiced']
+    outflow = -query['collected']
+    variance = inflow + outflow
+    cumvar = query['closing']
 
     # Create ColumnDataSource
     data = dict(
@@ -363,7 +274,7 @@ def accounts_receivables_balance_by_month():
 
     # Create plot
     p = figure(
-        title="Accounts Receivables Balance by Month",
+        title=title('accounts_receivables_balance_by_month'),
         x_range=month,
         tools=tools,
         x_axis_label='month/year',
@@ -386,23 +297,18 @@ def accounts_receivables_balance_by_month():
 
     return p
 
-def top_ten_customer_revenue_contribution_of_all_time():
+def top_ten_customer_revenue_contribution_of_all_time(datasets=None, filters=None):
     """Returns plot for top ten customer revenue contribution of all-time"""
-    
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .filter(document__reference__startswith='I')
-        .values('project__custaccount__customer__name')
-        .annotate(total=Sum('converted_amount'))
-        .order_by('-total')[:10]
-    )
 
-    # Creating lists from Queryset
-    customers = [i['project__custaccount__customer__name'] for i in query]
+    datasets = datasets or Datasets(filters)
+
+    # Dataset
+    query = datasets.get('top_ten_customer_income')
+
+    # Creating columns from Dataset
+    customers = query['customer__name'].tolist()
     custshort = ["".join([word[:1] for word in customer.split(' ')]) for customer in customers]
-    revenue = [round(i['total'], 2) for i in query]
+    revenue = np.round(query['total'], 2)
 
     # Create ColumnDataSource
     data = dict(
@@ -414,7 +320,7 @@ def top_ten_customer_revenue_contribution_of_all_time():
 
     # Create plot
     p = figure(
-        title="Top 10 Customer Revenue Contribution of All-Time",
+        title=title('top_ten_customer_revenue_contribution_of_all_time'),
         x_range=custshort,
         tools=tools,
         x_axis_label='customer',
@@ -433,24 +339,18 @@ def top_ten_customer_revenue_contribution_of_all_time():
 
     return p
 
-def top_ten_customer_revenue_contribution_last_twelve_months():
+def top_ten_customer_revenue_contribution_last_twelve_months(datasets=None, filters=None):
     """Returns plot for top ten customer revenue contribution in the last twelve months"""
 
-    # Queryset
-    latest = Transaction.objects.order_by('document__date').last()
-    query = (
-        Transaction
-        .objects
-        .filter(document__reference__startswith='I', document__date__range=(latest.document.date - relativedelta(years=1), latest.document.date))
-        .values('project__custaccount__customer__name')
-        .annotate(total=Sum('converted_amount'))
-        .order_by('-total')[:10]
-    )
+    datasets = datasets or Datasets(filters)
 
-    # Creating lists from Queryset
-    customers = [i['project__custaccount__customer__name'] for i in query]
+    # Dataset
+    query = datasets.get('top_ten_customer_income_last_twelve_months')
+
+    # Creating columns from Dataset
+    customers = query['customer__name'].tolist()
     custshort = ["".join([word[:1] for word in customer.split(' ')]) for customer in customers]
-    revenue = [round(i['total'], 2) for i in query]
+    revenue = np.round(query['total'], 2)
     
     # Create ColumnDataSource
     data = dict(
@@ -462,7 +362,7 @@ def top_ten_customer_revenue_contribution_last_twelve_months():
 
     # Create plot
     p = figure(
-        title="Top 10 Customer Revenue Contribution In The Last 12 Months",
+        title=title('top_ten_customer_revenue_contribution_last_twelve_months'),
         x_range=custshort,
         tools=tools,
         x_axis_label='customer',
@@ -481,22 +381,17 @@ def top_ten_customer_revenue_contribution_last_twelve_months():
 
     return p
 
-def total_projects_by_quarter():
+def total_projects_by_quarter(datasets=None, filters=None):
     """Returns plot for the total projects by quarter"""
 
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .annotate(quarter=TruncQuarter('document__date'))
-        .values('quarter')
-        .annotate(total=Count('project_id'))
-        .order_by()
-    )
+    datasets = datasets or Datasets(filters)
 
-    # Creating lists from Queryset
-    quarter = [i['quarter'].strftime("%b '%y") for i in query]
-    total = [round(i['total'], 2) for i in query]
+    # Dataset
+    query = datasets.get('projects_by_quarter')
+
+    # Creating columns from Dataset
+    quarter = [i.strftime("%b '%y") for i in query['quarter']]
+    total = query['total']
     
     # Create ColumnDataSource
     data = dict(
@@ -507,7 +402,7 @@ def total_projects_by_quarter():
     
     # Create plot
     p = figure(
-        title="Total Projects by Quarter",
+        title=title('total_projects_by_quarter'),
         x_range=quarter,
         tools=tools,
         x_axis_label='quarter',
@@ -526,23 +421,18 @@ def total_projects_by_quarter():
 
     return p
 
-def total_income_by_month():
+def total_income_by_month(datasets=None, filters=None):
     """Returns plot for the total income by month"""
 
-    # Queryset
-    query = (
-        Transaction
-        .objects
-        .filter(document__reference__startswith='I')
-        .annotate(month=TruncMonth('document__date'))
-        .values('month')
-        .annotate(total=Sum('converted_amount'))
-        .order_by()
-    )
+    datasets = datasets or Datasets(filters)
+
+    # Dataset
+    query = datasets.get('income_by_month')
 
-    # Creating lists from Queryset
-    month = [i['month'].strftime("%b '%y") for i in query]
-    total = [round(i['total'], 2) for i in query]
+    # Creating columns from Dataset
+    months, total = query['month'], query['total']
+    month = [i.strftime("%b '%y") for i in months]
+    total = np.round(total, 2)
     
     # Create ColumnDataSource
     data = dict(
@@ -553,7 +443,7 @@ def total_income_by_month():
 
     # Create plot
     p = figure(
-        title="Total Income by Month",
+        title=title('total_income_by_month'),
         x_range=month,
         tools=tools,
         x_axis_label='month/year',
@@ -0,0 +1,153 @@
+import string
+import itertools
+import numpy as np
+from django.core.management.base import CommandError
+
+# Translation table for Correction 2
+punctuation = str.maketrans('', '', string.punctuation + string.whitespace)
+
+# Reasons for Omissions 1 to 5, in order
+omissions = [
+    "DocDate does not begin from 2016 onwards",
+    "DocRef does not begin with B or I",
+    "Transaction in SGD but HomeWTaxAmt differs from AcCurWTaxAmt",
+    "Transaction in USD but AcCurWTaxAmt is more than or equals to HomeWTaxAmt",
+    "Either AcCurWTaxAmt or HomeWTaxAmt is 0",
+]
+
+# Reasons for every combination of failed omissions, indexed by bitmask
+combinations = [[reason for bit, reason in enumerate(omissions) if code >> bit & 1] for code in range(1 << len(omissions))]
+
+def correct_text(entry):
+    """Returns the entry with the text corrections applied"""
+
+    # Correction 1: Removes trailing whitespaces in all data
+    entry = [data.strip() for data in entry]
+
+    # Correction 2: Removes non-alphanumeric characters in DocRef & AcCode
+    entry[1:3] = [data.translate(punctuation) for data in entry[1:3]]
+
+    return entry
+
+def correct(entries):
+    """Yields each entry with the data corrections applied"""
+
+    for entry in entries:
+        # Corrections 1 and 2
+        entry = correct_text(entry)
+
+        # Correction 3: Apply abs() to AcCurWTaxAmt or HomeWTaxAmt
+        entry = [abs(float(data)) if index in [7, 8] else data for index, data in enumerate(entry)]
+
+        # Correction 4: Apply correct polarity to AcCurWTaxAmt or HomeWTaxAmt
+        entry = [data * -1 if index in [7, 8] and entry[1][0].upper() == 'B' else data for index, data in enumerate(entry)]
+
+        yield entry
+
+def validate(entry):
+    """Returns the list of omission reasons for a corrected entry"""
+
+    # Initial Check: Exits function immediately if length of data entry incorrect
+    if len(entry) != 14:
+        raise CommandError("Size of data entry is invalid!")
+
+    reasons = []
+
+    # Omission 1: Omits if DocDate does not begin from 2016 onwards
+    if int(entry[0][0:4]) < 2016:
+        reasons.append(omissions[0])
+
+    # Omission 2: Omits if DocRef does not begin with B or I
+    if entry[1][0].upper() not in ['B', 'I']:
+        reasons.append(omissions[1])
+
+    # Omission 3: Omits if transaction in SGD but HomeWTaxAmt differs from AcCurWTaxAmt
+    if entry[6].upper() == 'SGD' and abs(entry[7]) != abs(entry[8]):
+        reasons.append(omissions[2])
+
+    # Omission 4: Omits if transaction in USD but AcCurWTaxAmt is more than or equals to HomeWTaxAmt
+    if entry[6].upper() == 'USD' and abs(entry[7]) >= abs(entry[8]):
+        reasons.append(omissions[3])
+
+    # Omission 5: Omits if either AcCurWTaxAmt or HomeWTaxAmt is 0
+    if entry[7] == 0 or entry[8] == 0:
+        reasons.append(omissions[4])
+
+    return reasons
+
+def apply_joined(method, column, *args):
+    """Returns a column of strings with a str method applied to each
+
+    The method is called once over the column joined by NUL characters,
+    which it must keep, unless an entry contains one.
+    """
+
+    result = method("\0".join(column), *args).split("\0")
+    return result if len(result) == len(column) else [method(data, *args) for data in column]
+
+def read_columns(entries, size, batch=100):
+    """Returns up to the given number of entries as a list of columns
+
+    Entries are transposed a batch at a time, so that only the columns of
+    strings are held rather than a list per entry.
+    """
+
+    columns = [[] for _ in range(14)]
+    for remaining in range(size, 0, -batch):
+        entries_of_batch = list(itertools.islice(entries, min(batch, remaining)))
+
+        # Initial Check: Exits function immediately if length of any data entry incorrect
+        if any(len(entry) != 14 for entry in entries_of_batch):
+            raise CommandError("Size of data entry is invalid!")
+
+        for column, values in zip(columns, zip(*entries_of_batch)):
+            column.extend(values)
+        if len(entries_of_batch) < batch:
+            break
+    return columns
+
+def sanitise_columns(entries, size):
+    """Yields the corrected entries that passed and the ones that failed, with their reasons, a chunk at a time
+
+    Entries are read in chunks of the given size and transposed into columns.
+    The text corrections run over whole columns, and the amount corrections
+    and omission rules over NumPy arrays of the columns they use.
+    """
+
+    while True:
+        columns = read_columns(entries, size)
+        if not columns[0]:
+            return
+
+        # Correction 1: Removes trailing whitespaces in all data
+        columns = [list(map(str.strip, column)) for column in columns]
+
+        # Correction 2: Removes non-alphanumeric characters in DocRef & AcCode
+        columns[1:3] = [apply_joined(str.translate, column, punctuation) for column in columns[1:3]]
+
+        # Load the columns used by the rules
+        years = np.array(columns[0]).astype('U4').astype(np.int64)
+        prefixes = np.array(apply_joined(str.upper, [data[0:1] for data in columns[1]]))
+        currencies = np.array(apply_joined(str.upper, columns[6]))
+
+        # Correction 3: Apply abs() to AcCurWTaxAmt and HomeWTaxAmt
+        amounts = np.abs(np.array(columns[7:9], dtype=np.float64))
+
+        # Omissions 1 to 5 as boolean masks, in the order of their reasons
+        failed = np.array([
+            years < 2016,
+            (prefixes != 'B') & (prefixes != 'I'),
+            (currencies == 'SGD') & (amounts[0] != amounts[1]),
+            (currencies == 'USD') & (amounts[0] >= amounts[1]),
+            (amounts[0] == 0) | (amounts[1] == 0),
+        ])
+        codes = (1 << np.arange(len(omissions))) @ failed
+
+        # Correction 4: Apply correct polarity to AcCurWTaxAmt and HomeWTaxAmt
+        columns[7:9] = np.where(prefixes == 'B', -amounts, amounts).tolist()
+
+        # Split the chunk by outcome, appending the reasons to failed entries
+        corrected = list(zip(*columns))
+        passed = list(itertools.compress(corrected, (codes == 0).tolist()))
+        failed = [entry + (", ".join(combinations[code]),) for entry, code in zip(itertools.compress(corrected, codes.tolist()), codes[codes != 0].tolist())]
+        yield passed, failed
@@ -0,0 +1,66 @@
+import decimal
+import numpy as np
+from django.db.models.query import QuerySet
+
+class Columns:
+    """Columnar result of a dataset, one NumPy array per field
+
+    Decimal fields become float arrays, with NaN for NULL, integer fields
+    become integer arrays and every other field an object array. Slicing
+    returns a Columns with every array sliced; indexing by name returns the
+    array of that field, or an empty array for any name if there are no rows.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    @classmethod
+    def fetch(cls, rows):
+        """Returns the columns of a values() queryset, fetched once with values_list, or of a list of dictionaries"""
+        if isinstance(rows, QuerySet):
+            names = list(rows._fields) + [name for name in rows.query.annotation_select if name not in rows._fields]
+            rows = list(rows.values_list(*names))
+        else:
+            names = list(rows[0]) if rows else []
+            rows = [tuple(row[name] for name in names) for row in rows]
+        return cls({name: typed(column) for name, column in zip(names, zip(*rows) if rows else [()] * len(names))})
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Columns({name: array[key] for name, array in self.arrays.items()})
+        if key not in self.arrays and not len(self):
+            return np.empty(0, dtype=object)
+        return self.arrays[key]
+
+    def __len__(self):
+        return len(next(iter(self.arrays.values()), ()))
+
+    def factorize(self, name):
+        """Returns the distinct values of a field in order of appearance and the position of each row's value among them"""
+        positions = {}
+        inverse = np.fromiter((positions.setdefault(value, len(positions)) for value in self[name]), dtype=np.int64, count=len(self))
+        return list(positions), inverse
+
+    def group(self, by, values):
+        """Returns the distinct values of a field in order of appearance and the sum of another field for each"""
+        labels, inverse = self.factorize(by)
+        return labels, np.bincount(inverse, weights=self[values].astype(np.float64), minlength=len(labels))
+
+    def pivot(self, index, columns, values):
+        """Returns the distinct values of two fields in order of appearance and the sums of a third field as a columns by index matrix"""
+        index_labels, index_inverse = self.factorize(index)
+        column_labels, column_inverse = self.factorize(columns)
+        matrix = np.zeros((len(column_labels), len(index_labels)))
+        np.add.at(matrix, (column_inverse, index_inverse), self[values].astype(np.float64))
+        return index_labels, column_labels, matrix
+
+def typed(column):
+    """Returns a column of values as an array of the narrowest suitable type"""
+    sample = next((value for value in column if value is not None), None)
+    if isinstance(sample, decimal.Decimal) or isinstance(sample, float):
+        return np.array([np.nan if value is None else float(value) for value in column], dtype=np.float64)
+    if isinstance(sample, int) and not isinstance(sample, bool) and None not in column:
+        return np.array(column, dtype=np.int64)
+    array = np.empty(len(column), dtype=object)
+    array[:] = column
+    return array
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+from django.conf import settings
+from django.db import connections
+
+# Pragmas that write to the database file, skipped on read-only connections
+WRITE_PRAGMAS = {'journal_mode'}
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Runs SQLITE_PRAGMAS on a new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    readonly = 'mode=ro' in connection.settings_dict['NAME']
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            if readonly and pragma in WRITE_PRAGMAS:
+                continue
+            cursor.execute('PRAGMA {} = {}'.format(pragma, value))
+
+def publish_replica():
+    """Copies the primary SQLite database to DATABASE_REPLICA and swaps the copy in atomically, returning its path or None if there is no replica"""
+    path = getattr(settings, 'DATABASE_REPLICA', None)
+    if not path or 'replica' not in settings.DATABASES or connections['default'].vendor != 'sqlite':
+        return None
+
+    # Back up into a file beside the replica, so the rename stays on one file system
+    # The backup API copies a consistent state including pages still in the WAL
+    temp = path + '.tmp'
+    connections['default'].ensure_connection()
+    target = sqlite3.connect(temp)
+    try:
+        connections['default'].connection.backup(target)
+
+        # Read-only readers cannot use WAL, and a stale -wal file must never pair with a new copy
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+
+    # Readers that already opened the old replica keep reading it until they reconnect
+    os.replace(temp, path)
+    return path
+
+def replica_migrated(sender, using, verbosity=1, plan=None, **kwargs):
+    """Publishes the replica again after migrate, so the dashboards never read a replica with an older schema than the code
+
+    Only an existing replica of a file database is published, which keeps
+    migrations of the in-memory test database away from it, and not when
+    migrate found nothing to apply.
+    """
+    path = getattr(settings, 'DATABASE_REPLICA', None)
+    connection = connections[using]
+    if using != 'default' or connection.vendor != 'sqlite' or connection.is_in_memory_db() or not path or not os.path.exists(path):
+        return
+    if plan is not None and not plan:
+        return
+    if publish_replica() is not None and verbosity >= 1:
+        print("Read replica was published to {}".format(path))
@@ -0,0 +1,212 @@
+import itertools
+import threading
+import collections
+from dateutil.relativedelta import relativedelta
+from django.db.models.functions import Coalesce, TruncQuarter, TruncYear
+from django.db.models import Sum, Max, Q
+from web.models import *
+from web.cache import cached_values, data_version
+from web.filters import ChartFilter, DIMENSIONS
+from web.rollup import GRAINS
+
+class Datasets:
+    """Per-render access to the named datasets used by the charts
+
+    Each dataset is fetched at most once per instance, so charts that share
+    a dataset within the same render share its query as well. Charts built
+    in different threads wait for a dataset another thread is fetching.
+    Every dataset is restricted by the filter of the instance.
+    """
+
+    def __init__(self, filters=None):
+        self.filters = filters or ChartFilter()
+        self.results = {}
+        self.requests = 0
+        self.version = None
+        self.lock = threading.Lock()
+        self.locks = collections.defaultdict(threading.Lock)
+
+    def get(self, name):
+        """Returns the columns of the named dataset"""
+        with self.lock:
+            self.requests += 1
+            if self.version is None:
+                self.version = data_version()
+            lock = self.locks[name]
+        with lock:
+            if name not in self.results:
+                key = '{}?{}'.format(name, self.filters.key) if self.filters else name
+                self.results[name] = cached_values(key, lambda: DATASETS[name](self.filters), self.version)
+        return self.results[name]
+
+    @property
+    def saved(self):
+        """Number of dataset requests answered without running a query"""
+        return self.requests - len(self.results)
+
+def summary(filters, *dimensions):
+    """Returns the monthly summary rows of the narrowest grain keeping the given dimensions and every dimension the filter sets"""
+    needed = set(dimensions) | {field for field in DIMENSIONS if getattr(filters, field)}
+    grain = min((grain for grain, kept in GRAINS.items() if needed <= set(kept)), key=lambda grain: len(GRAINS[grain]))
+    return MonthlySummary.objects.filter(grain=grain)
+
+def customer_receivables(filters):
+    """Returns invoiced and collected totals and the latest closing balance per customer, ordered by descending balance"""
+
+    # Balances of filters the snapshots cannot apply are summed from the summary up to the end of the range
+    if not filters.supports(ReceivableSnapshot):
+        in_range = Q(month__gte=filters.start) if filters.start else Q()
+        return (
+            summary(filters, 'customer')
+            .filter(filters.q(MonthlySummary), customer__isnull=False)
+            .filter(**({'month__lte': filters.end} if filters.end else {}))
+            .values('customer__name')
+            .annotate(invoiced=Coalesce(Sum('converted_amount', filter=in_range & Q(doc_type='I')), 0), collected=Coalesce(-Sum('converted_amount', filter=in_range & Q(doc_type='B')), 0), closing=Sum('converted_amount'))
+            .order_by('-closing')
+        )
+
+    snapshots = ReceivableSnapshot.objects.filter(filters.q(ReceivableSnapshot, month='month'))
+    latest = snapshots.aggregate(latest=Max('month'))['latest']
+    return (
+        snapshots
+        .filter(customer__isnull=False)
+        .values('customer__name')
+        .annotate(invoiced=Sum('invoiced'), collected=Sum('collected'), closing=Sum('closing', filter=Q(month=latest)))
+        .order_by('-closing')
+    )
+
+def receivables_by_month(filters):
+    """Returns invoiced, collected and closing balance totals per month, ordered by month"""
+
+    # Balances of filters the snapshots cannot apply are accumulated from the summary up to the end of the range
+    if not filters.supports(ReceivableSnapshot):
+        query = (
+            summary(filters)
+            .filter(filters.q(MonthlySummary))
+            .filter(**({'month__lte': filters.end} if filters.end else {}))
+            .values('month')
+            .annotate(invoiced=Coalesce(Sum('converted_amount', filter=Q(doc_type='I')), 0), collected=Coalesce(-Sum('converted_amount', filter=Q(doc_type='B')), 0))
+            .order_by('month')
+        )
+        rows = []
+        closing = 0
+        for i in query:
+            closing += i['invoiced'] - i['collected']
+            if filters.start is None or i['month'] >= filters.start:
+                rows.append(dict(i, closing=closing))
+        return rows
+
+    return (
+        ReceivableSnapshot
+        .objects
+        .filter(filters.q(ReceivableSnapshot, month='month'))
+        .values('month')
+        .annotate(invoiced=Sum('invoiced'), collected=Sum('collected'), closing=Sum('closing'))
+        .order_by('month')
+    )
+
+def location_income_by_year(filters):
+    """Returns invoiced amount per year and location, latest year first"""
+    return (
+        summary(filters, 'location')
+        .filter(filters.q(MonthlySummary, month='month'), doc_type='I')
+        .annotate(year=TruncYear('month'))
+        .values('year', 'location__code')
+        .annotate(total=Sum('converted_amount'))
+        .order_by('-year')
+    )
+
+def salesperson_income_by_year(filters):
+    """Returns invoiced amount per year and salesperson, latest year first"""
+    return (
+        summary(filters, 'salesperson')
+        .filter(filters.q(MonthlySummary, month='month'), doc_type='I')
+        .annotate(year=TruncYear('month'))
+        .values('year', 'salesperson__name')
+        .annotate(total=Sum('converted_amount'))
+        .order_by('-year')
+    )
+
+def income_by_month(filters):
+    """Returns invoiced amount per month, ordered by month"""
+    return (
+        summary(filters)
+        .filter(filters.q(MonthlySummary, month='month'), doc_type='I')
+        .values('month')
+        .annotate(total=Sum('converted_amount'))
+        .order_by('month')
+    )
+
+def project_income_by_month(filters):
+    """Returns invoiced amount per month and project, ordered by month"""
+    return (
+        MonthlyRollup
+        .objects
+        .filter(filters.q(MonthlyRollup, month='month'), doc_type='I')
+        .values('month', 'project__code')
+        .annotate(total=Sum('converted_amount'))
+        .order_by('month')
+    )
+
+def top_ten_customer_income(filters):
+    """Returns the ten customers with the highest invoiced amount of all time"""
+    return (
+        summary(filters, 'customer')
+        .filter(filters.q(MonthlySummary, month='month'), doc_type='I')
+        .values('customer__name')
+        .annotate(total=Sum('converted_amount'))
+        .order_by('-total')[:10]
+    )
+
+def top_ten_customer_income_last_twelve_months(filters):
+    """Returns the ten customers with the highest invoiced amount in the year up to the latest document"""
+
+    # Whole months come from the summary and the partial first month from transactions
+    summaries = summary(filters, 'customer').filter(filters.q(MonthlySummary, month='month'))
+    latest = summaries.aggregate(latest=Max('last_date'))['latest']
+    if latest is None:
+        return []
+    start = latest - relativedelta(years=1)
+    months = (
+        summaries
+        .filter(doc_type='I', month__gt=start)
+        .values_list('customer__name')
+        .annotate(total=Sum('converted_amount'))
+        .order_by()
+    )
+    partial = (
+        Transaction
+        .objects
+        .filter(filters.q(Transaction, date='date'), doc_type='I', date__range=(start, start + relativedelta(day=31)))
+        .values_list('project__custaccount__customer__name')
+        .annotate(total=Sum('converted_amount'))
+        .order_by()
+    )
+    totals = collections.Counter()
+    for customer, total in itertools.chain(months, partial):
+        totals[customer] += total
+    return [{'customer__name': customer, 'total': total} for customer, total in totals.most_common(10)]
+
+def projects_by_quarter(filters):
+    """Returns the number of project transactions per quarter"""
+    return (
+        summary(filters)
+        .filter(filters.q(MonthlySummary, month='month'))
+        .annotate(quarter=TruncQuarter('month'))
+        .values('quarter')
+        .annotate(total=Coalesce(Sum('projects'), 0))
+        .order_by()
+    )
+
+# Registry of datasets by name
+DATASETS = {
+    'customer_receivables': customer_receivables,
+    'receivables_by_month': receivables_by_month,
+    'location_income_by_year': location_income_by_year,
+    'salesperson_income_by_year': salesperson_income_by_year,
+    'income_by_month': income_by_month,
+    'project_income_by_month': project_income_by_month,
+    'top_ten_customer_income': top_ten_customer_income,
+    'top_ten_customer_income_last_twelve_months': top_ten_customer_income_last_twelve_months,
+    'projects_by_quarter': projects_by_quarter,
+}
@@ -0,0 +1,77 @@
+import collections
+from django.db.utils import IntegrityError
+from web.models import *
+
+# Natural key and attributes of each dimension model, in order of creation
+# Attributes ending in __key refer to another dimension by its natural key
+DIMENSIONS = collections.OrderedDict([
+    (Customer, ('name', [])),
+    (Currency, ('code', [])),
+    (SalesPerson, ('code', ['name', 'contact'])),
+    (Location, ('code', [])),
+    (CustomerAccount, ('code', ['postal', 'contact', 'customer__name', 'currency__code'])),
+    (Project, ('code', ['custaccount__code', 'salesperson__code'])),
+])
+
+class DimensionResolver:
+    """Natural key to primary key maps of the dimension models for an import run
+
+    Existing members are loaded once. Members resolved for the first time
+    are queued and created in batches by flush, after which their keys stay
+    in the maps for the rest of the run. Resolving a known key with other
+    attributes raises IntegrityError, as get_or_create would.
+    """
+
+    def __init__(self):
+        self.members = {}
+        self.pending = {}
+        self.hits = collections.Counter()
+        self.lookups = collections.Counter()
+        for model, (key, attributes) in DIMENSIONS.items():
+            self.members[model] = {row[1]: (row[0], tuple(row[2:])) for row in model.objects.values_list('pk', key, *attributes)}
+            self.pending[model] = []
+
+    def resolve(self, model, key, *attributes):
+        """Returns the key of a member, queueing it for creation if it does not exist"""
+        self.lookups[model] += 1
+        if key in self.members[model]:
+            if self.members[model][key][1] != attributes:
+                raise IntegrityError("{} {} already exists".format(model._meta.verbose_name, key))
+            self.hits[model] += 1
+        else:
+            self.members[model][key] = (None, attributes)
+            self.pending[model].append(key)
+        return key
+
+    def pk(self, model, key):
+        """Returns the primary key of a created member"""
+        return self.members[model][key][0]
+
+    def flush(self, batch_size=None):
+        """Creates the queued members with one bulk_create per model"""
+        for model, (key, attributes) in DIMENSIONS.items():
+            if not self.pending[model]:
+                continue
+
+            # Build members, attaching foreign keys of members created earlier in this flush
+            objs = []
+            for member in self.pending[model]:
+                obj = model(**{key: member})
+                for attribute, value in zip(attributes, self.members[model][member][1]):
+                    if '__' in attribute:
+                        field = model._meta.get_field(attribute.split('__')[0])
+                        setattr(obj, field.attname, self.pk(field.related_model, value))
+                    else:
+                        setattr(obj, attribute, value)
+                objs.append(obj)
+            model.objects.bulk_create(objs, batch_size=batch_size)
+
+            # Not every database returns primary keys from bulk_create
+            for i in range(0, len(self.pending[model]), 500):
+                for pk, member in model.objects.filter(**{key + '__in': self.pending[model][i:i + 500]}).values_list('pk', key):
+                    self.members[model][member] = (pk, self.members[model][member][1])
+            self.pending[model] = []
+
+    def stats(self):
+        """Returns the name, hits and lookups of each dimension model"""
+        return [(model._meta.verbose_name, self.hits[model], self.lookups[model]) for model in DIMENSIONS]
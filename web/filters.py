@@ -0,0 +1,97 @@
+import re
+import datetime
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q
+from django.utils.http import urlencode
+from web.models import *
+
+# Lookups of each filter field per model; a model without a lookup for a set field cannot apply the filter
+LOOKUPS = {
+    MonthlyRollup: {
+        'location': 'location__code',
+        'salesperson': 'salesperson__name',
+        'customer': 'customer__name',
+        'currency': 'project__custaccount__currency__code',
+    },
+    MonthlySummary: {
+        'location': 'location__code',
+        'salesperson': 'salesperson__name',
+        'customer': 'customer__name',
+        'currency': 'currency__code',
+    },
+    Transaction: {
+        'location': 'location__code',
+        'salesperson': 'project__salesperson__name',
+        'customer': 'project__custaccount__customer__name',
+        'currency': 'project__custaccount__currency__code',
+    },
+    ReceivableSnapshot: {
+        'customer': 'customer__name',
+    },
+}
+
+# Filter fields that select dimension members, in query parameter order
+DIMENSIONS = ['location', 'salesperson', 'customer', 'currency']
+
+class ChartFilter:
+    """Date range and dimension filters shared by every chart
+
+    The range runs from the first day of the start month to the last day of
+    the end month, and the dimensions match location codes, salesperson and
+    customer names and currency codes. Unset fields do not filter.
+    """
+
+    def __init__(self, start=None, end=None, location=None, salesperson=None, customer=None, currency=None):
+        self.start = start and start.replace(day=1)
+        self.end = end and end.replace(day=1)
+        self.location = location
+        self.salesperson = salesperson
+        self.customer = customer
+        self.currency = currency
+
+    @classmethod
+    def from_query(cls, params):
+        """Returns the filter given by the query parameters of a request, ignoring malformed months"""
+        return cls(
+            start=parse_month(params.get('from', '')),
+            end=parse_month(params.get('to', '')),
+            **{field: params.get(field) or None for field in DIMENSIONS}
+        )
+
+    def params(self):
+        """Returns the query parameters of the filter"""
+        params = [('from', self.start and self.start.strftime("%Y-%m")), ('to', self.end and self.end.strftime("%Y-%m"))]
+        params += [(field, getattr(self, field)) for field in DIMENSIONS]
+        return [(name, value) for name, value in params if value]
+
+    @property
+    def key(self):
+        """Query string identifying the filter in cache keys and chart URLs, empty when nothing is filtered"""
+        return urlencode(self.params())
+
+    def __bool__(self):
+        return bool(self.params())
+
+    def supports(self, model):
+        """Returns whether every set dimension can be applied to a model"""
+        return all(field in LOOKUPS[model] for field in DIMENSIONS if getattr(self, field))
+
+    def q(self, model, month=None, date=None):
+        """Returns the predicates of the filter for a model, matching the range on a month or a date field"""
+        q = Q(**{LOOKUPS[model][field]: getattr(self, field) for field in DIMENSIONS if getattr(self, field)})
+        if month and self.start:
+            q &= Q(**{month + '__gte': self.start})
+        if month and self.end:
+            q &= Q(**{month + '__lte': self.end})
+        if date and self.start:
+            q &= Q(**{date + '__gte': self.start})
+        if date and self.end:
+            q &= Q(**{date + '__lt': self.end + relativedelta(months=1)})
+        return q
+
+def parse_month(value):
+    """Returns the first day of a YYYY-MM month, or None if the value is not one"""
+    match = re.fullmatch(r'(\d{4})-(\d{2})', value)
+    if match is None or not 1 <= int(match.group(2)) <= 12:
+        return None
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
@@ -0,0 +1,131 @@
+import os
+import csv
+import io
+import json
+import time
+import tempfile
+import platform
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.contrib.auth.models import User, Group
+from web import registry
+from web.cache import bump_data_version
+from web.datasets import Datasets
+from web.synthetic import header, generate_ledger
+
+class Command(BaseCommand):
+    help = 'benchmarks data loading, charts and dashboard rendering against a throwaway database'
+
+    def add_arguments(self, parser):
+        # Optional Arguments
+        parser.add_argument('--rows', type=int, default=100000, help='number of synthetic rows to generate')
+        parser.add_argument('--input', type=str, default=None, help='benchmark an existing export instead of generating one')
+        parser.add_argument('--bulk', action='store_true', help='import with importdata --bulk')
+        parser.add_argument('--repeat', type=int, default=3, help='number of timed runs per chart and dashboard')
+        parser.add_argument('--output', type=str, default='benchmark.json', help='path of the JSON results file')
+
+    def handle(self, *args, **options):
+        # Check if file exists in path
+        if options['input'] is not None and not os.path.isfile(options['input']):
+            raise CommandError("{} does not exists!".format(options['input']))
+
+        results = {
+            'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {key: options[key] for key in ['rows', 'input', 'bulk', 'repeat']},
+            'steps': {},
+        }
+
+        # Run everything against a test database and a private cache so real data is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        cwd = os.getcwd()
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark', 'TIMEOUT': None}}, CHART_LAZY_LOADING=False, DATABASE_REPLICA=None):
+                os.chdir(directory)
+
+                # Step 1: Generate or copy the export
+                lap = time.perf_counter()
+                filepath = options['input'] and os.path.join(cwd, options['input'])
+                if filepath is None:
+                    filepath = os.path.join(directory, 'synthetic.csv')
+                    with open(filepath, "w+", encoding="utf-8") as f:
+                        pointer = csv.writer(f)
+                        pointer.writerow(header)
+                        pointer.writerows(generate_ledger(options['rows']))
+                    results['steps']['generate'] = self.step('generate', lap, options['rows'])
+
+                # Step 2: Clean the export
+                lap = time.perf_counter()
+                call_command('cleandata', filepath, stdout=io.StringIO())
+                with open(filepath, "r", encoding="utf-8") as f:
+                    rows = sum(1 for line in f) - 1
+                results['steps']['cleandata'] = self.step('cleandata', lap, rows)
+
+                # Step 3: Import the cleaned export
+                lap = time.perf_counter()
+                call_command('importdata', 'sanitised.csv', bulk=options['bulk'], stdout=io.StringIO())
+                with open('sanitised.csv', "r", encoding="utf-8") as f:
+                    rows = sum(1 for line in f) - 1
+                results['steps']['importdata'] = self.step('importdata', lap, rows)
+
+                # Step 4: Build every chart, cold and from cache
+                results['charts'] = {}
+                for chart in registry.REGISTRY:
+                    results['charts'][chart.id] = self.measure(lambda: chart(Datasets()), options['repeat'])
+                    self.stdout.write("{:<60} {:>8.3f}s".format(chart.id, results['charts'][chart.id]['cold']))
+
+                # Step 5: Render the dashboard of every group, cold and from cache
+                results['index'] = {}
+                for group in registry.GROUPS:
+                    user = User.objects.create(username='benchmark-{}'.format(group.lower().replace(' ', '-')))
+                    user.groups.add(Group.objects.get_or_create(name=group)[0])
+                    client = Client()
+                    client.force_login(user)
+                    results['index'][group] = self.measure(lambda: client.get('/'), options['repeat'])
+                    results['index'][group]['bytes'] = len(client.get('/').content)
+                    self.stdout.write("{:<60} {:>8.3f}s".format(group, results['index'][group]['cold']))
+        finally:
+            os.chdir(cwd)
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        # Output result
+        with open(options['output'], "w+", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        self.stdout.write(self.style.SUCCESS("Benchmark results were exported to {}".format(options['output'])))
+
+    def step(self, name, started, rows):
+        """Returns the timing of a data loading step"""
+        seconds = time.perf_counter() - started
+        self.stdout.write("{:<60} {:>8.3f}s".format(name, seconds))
+        return {'seconds': seconds, 'rows': rows, 'rows_per_second': rows / seconds if seconds else None}
+
+    def measure(self, func, repeat):
+        """Returns cold and warm timings of a callable and the queries its cold run issued on this thread"""
+
+        # Cold run with cached chart outputs invalidated
+        bump_data_version()
+        queries = []
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(record):
+            lap = time.perf_counter()
+            func()
+            cold = time.perf_counter() - lap
+
+        # Warm runs reusing cached chart outputs
+        warm = []
+        for i in range(repeat):
+            lap = time.perf_counter()
+            func()
+            warm.append(time.perf_counter() - lap)
+
+        return {'cold': cold, 'warm': min(warm) if warm else None, 'queries': len(queries)}
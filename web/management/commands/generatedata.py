@@ -0,0 +1,37 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from web.synthetic import header, generate_ledger
+
+class Command(BaseCommand):
+    help = 'generates a synthetic ledger export for cleandata and importdata'
+
+    def add_arguments(self, parser):
+        # Positional Arguments
+        parser.add_argument('rows', type=int)
+
+        # Optional Arguments
+        parser.add_argument('--output', type=str, default='synthetic.csv', help='path of the generated CSV file')
+        parser.add_argument('--customers', type=int, default=300, help='number of distinct customers')
+        parser.add_argument('--salespersons', type=int, default=8, help='number of distinct salespersons')
+        parser.add_argument('--locations', type=int, default=5, help='number of distinct locations')
+        parser.add_argument('--seed', type=int, default=0, help='random seed')
+
+    def handle(self, *args, **options):
+        # Check arguments
+        if options['rows'] < 1:
+            raise CommandError("Number of rows must be positive!")
+
+        # Stream generated rows to file
+        with open(options['output'], "w+", encoding="utf-8") as f:
+            pointer = csv.writer(f)
+            pointer.writerow(header)
+            pointer.writerows(generate_ledger(
+                options['rows'],
+                customers=options['customers'],
+                salespersons_count=options['salespersons'],
+                locations=options['locations'],
+                seed=options['seed'],
+            ))
+
+        # Output result
+        self.stdout.write(self.style.SUCCESS("{} entries were generated and exported to {}".format(options['rows'], options['output'])))
@@ -1,9 +1,23 @@
 import os
 import csv
+import time
+import decimal
+import hashlib
+import collections
+from concurrent.futures import ProcessPoolExecutor
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
 from django.db.utils import IntegrityError
 from django.utils.dateparse import parse_date
 from web.models import *
+from web import shards
+from web.shards import fingerprint
+from web.cleaning import sanitise_columns
+from web.dimensions import DimensionResolver
+from web.rollup import refresh_rollup, refresh_summary, refresh_receivables
+from web.cache import bump_data_version
+from web.database import publish_replica
+from web.routers import primary
 
 class Command(BaseCommand):
     help = 'loads analytics data into database'
@@ -12,66 +26,246 @@ class Command(BaseCommand):
         # Positional Arguments
         parser.add_argument('filepath', nargs='+', type=str)
 
+        # Optional Arguments
+        parser.add_argument('--bulk', action='store_true', help='resolve dimensions in memory and write with batched bulk_create')
+        parser.add_argument('--batch-size', type=int, default=None, help='number of objects per bulk_create batch (defaults to the largest the database allows)')
+        parser.add_argument('--workers', type=int, default=1, help='parse the file in this many processes and import with --bulk')
+        parser.add_argument('--clean', action='store_true', help='apply the cleandata corrections and omission rules to a raw export before importing it')
+        parser.add_argument('--rejects', type=str, default='omitted.csv', help='path of the omitted entries file written by --clean')
+        parser.add_argument('--incremental', action='store_true', help='skip entries already imported from this file and update changed amounts')
+
+    @primary()
     def handle(self, *args, **options):
         # Check if file exists in path
         filepath = options['filepath'][0]
         if not os.path.isfile(filepath):
             raise CommandError("{} does not exists!".format(filepath))
 
-        # Creates a blank list for manipulating the data
-        original = []
+        # Check arguments
+        if options['workers'] < 1:
+            raise CommandError("Number of workers must be positive!")
+
+        # Parse shards of the file in worker processes, into records for the bulk import unless the entries are cleaned or compared first
+        typed = options['workers'] > 1 and not options['clean'] and not options['incremental']
+        if options['workers'] > 1:
+            original = self.parse_shards(filepath, options['workers'], typed)
+        else:
+            # Creates a blank list for manipulating the data
+            original = []
+
+            # Open file and append each entry in CSV file to the report list
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = csv.reader(f)
+                for entry in data:
+                    original.append(entry)
+
+            # Removes trailing whitespaces in all data
+            original = [[data.strip() for data in entry] for entry in original]
+
+        # Clean a raw export in place of a sanitised file from cleandata
+        if options['clean']:
+            original = self.clean(original, options['rejects'])
+        entries = original[1:]
+
+        # Skip entries imported before, using the checkpoint of the file and the fingerprint of each entry
+        updated = []
+        if options['incremental']:
+            path = os.path.abspath(filepath)
+            checkpoint = ImportCheckpoint.objects.filter(path=path).first()
+            file_digest, prefix_digest = digest(original, checkpoint.rows + 1 if checkpoint else None)
+            if checkpoint is not None and checkpoint.digest == file_digest:
+                self.stdout.write(self.style.SUCCESS("{} is unchanged since its last import".format(filepath)))
+                return
+            appended = checkpoint is not None and checkpoint.digest == prefix_digest
+            if appended:
+                entries = entries[checkpoint.rows:]
+            entries, updated = self.detect_changes(entries, options['batch_size'], appended)
+
+        # Import entries with the selected strategy; the parent process resolves and writes parsed shards in bulk
+        if options['bulk'] or options['workers'] > 1:
+            imported = self.bulk_import(entries if typed else shards.typed(entries, *self.amount_format()), options['batch_size'])
+        else:
+            imported = self.import_each(entries)
+
+        # Record checkpoint of the file
+        if options['incremental']:
+            last = max((entry[0] for entry in original[1:]), default='')
+            ImportCheckpoint.objects.update_or_create(path=path, defaults={
+                'digest': file_digest,
+                'rows': len(original[1:]),
+                'last_date': parse_date("{}-{}-{}".format(last[0:4], last[4:6], last[6:8])) if last else None,
+            })
+
+        # Refresh rollup and receivables for the months that received new or updated entries and invalidate cached charts
+        months = {date.replace(day=1) for date in imported + updated if date is not None}
+        if months:
+            refresh_rollup(months)
+            refresh_summary(months)
+            refresh_receivables(months)
+            bump_data_version()
+
+            # Publish the new data to the dashboards in one step
+            replica = publish_replica()
+            if replica is not None:
+                self.stdout.write(self.style.SUCCESS("Read replica was published to {}".format(replica)))
+
+        # Output result
+        if options['incremental']:
+            self.stdout.write(self.style.SUCCESS("{} entries were unchanged and skipped".format(len(original[1:]) - len(entries) - len(updated))))
+            self.stdout.write(self.style.SUCCESS("{} entries were updated with changed amounts".format(len(updated))))
+        self.stdout.write(self.style.SUCCESS("{}/{} entries were imported into the database".format(len(imported), len(original[1:]))))
+        self.stdout.write(self.style.SUCCESS("{} months were refreshed in the rollup".format(len(months))))
+
+    def amount_format(self):
+        """Returns the digits and decimal places of the transaction amounts"""
+        field = Transaction._meta.get_field('transacted_amount')
+        return field.max_digits, field.decimal_places
+
+    def parse_shards(self, filepath, workers, typed=False):
+        """Returns the stripped entries of the file, or their records if typed, header first, parsed in byte-range shards by a process pool
+
+        Shards are collected in file order, so conflicting entries resolve
+        the same way as when the file is read in a single process.
+        """
+
+        header, ranges = shards.split(filepath, workers)
+        if header is None:
+            return []
+        original = [[data.strip() for data in header]]
+        if not ranges:
+            return original
+
+        # Worker processes must not inherit open database connections
+        connections.close_all()
+
+        stats = collections.OrderedDict()
+        started = time.perf_counter()
+        with ProcessPoolExecutor(workers) as executor:
+            amounts = self.amount_format() if typed else None
+            for entries, seconds, pid in executor.map(shards.parse, [filepath] * len(ranges), *zip(*ranges), [amounts] * len(ranges)):
+                original.extend(entries)
+                rows, busy = stats.get(pid, (0, 0))
+                stats[pid] = (rows + len(entries), busy + seconds)
+        elapsed = time.perf_counter() - started
+
+        # Output throughput per worker
+        for pid, (rows, seconds) in stats.items():
+            self.stdout.write("worker {:<8} {:>8} rows {:>8.2f}s ({:.0f} rows/s)".format(pid, rows, seconds, rows / seconds if seconds else 0))
+        self.stdout.write("{:<15} {:>8} rows {:>8.2f}s ({:.0f} rows/s)".format('parse', len(original) - 1, elapsed, (len(original) - 1) / elapsed if elapsed else 0))
+
+        return original
+
+    def clean(self, original, rejects):
+        """Returns the header and the entries that pass the cleandata rules, writing the omitted entries to the rejects file"""
+
+        if not original:
+            return original
+
+        # Writes header to the two outputs, with the reasons column added as cleandata does
+        header = original[0] + ['FailedConditions']
+        cleaned = [header]
+        omitted = 0
+        partial = rejects + ".part"
+        try:
+            with open(partial, "w+", encoding="utf-8") as o:
+                omitted_pointer = csv.writer(o)
+                omitted_pointer.writerow(header)
+
+                # Amounts are formatted as in sanitised.csv so entries import identically
+                for passed, failed in sanitise_columns(iter(original[1:]), 100000):
+                    cleaned.extend([str(data) for data in entry] for entry in passed)
+                    omitted_pointer.writerows(failed)
+                    omitted += len(failed)
+            os.replace(partial, rejects)
+        finally:
+            # Discards partial output if cleaning did not complete
+            if os.path.exists(partial):
+                os.remove(partial)
+
+        self.stdout.write(self.style.SUCCESS("{} entries were omitted and exported to {}".format(omitted, rejects)))
+        return cleaned
+
+    def detect_changes(self, entries, batch_size, appended=False):
+        """Updates amounts of transactions whose entries changed and returns the new entries and the dates of the updated transactions
+
+        As in a full import, the first entry for a document and project wins
+        and later entries for the same transaction are ignored. Entries
+        appended after an unchanged prefix never update a transaction, since
+        a full import would have rejected them as well.
+        """
+
+        # Initial Check: Exits function immediately if length of any data entry incorrect
+        if any(len(entry) != 14 for entry in entries):
+            raise CommandError("Size of data entry is invalid!")
+
+        # Find which entries are stored unchanged by their fingerprints
+        fingerprints = [fingerprint(entry) for entry in entries]
+        known = set()
+        for chunk in chunks(sorted(set(fingerprints)), 500):
+            known.update(Transaction.objects.filter(fingerprint__in=chunk).values_list('fingerprint', flat=True))
+
+        # Find transactions of the other entries by document and project
+        existing = {}
+        for chunk in chunks(sorted({entry[1] for entry, key in zip(entries, fingerprints) if key not in known}), 500):
+            for reference, project, pk, date, transacted, converted in Transaction.objects.filter(document__reference__in=chunk).values_list('document__reference', 'project__code', 'pk', 'date', 'transacted_amount', 'converted_amount'):
+                existing[(reference, project)] = (pk, date, transacted, converted)
+
+        # Update transactions whose first entry has other amounts
+        new = []
+        updates = {}
+        seen = set()
+        for entry, key in zip(entries, fingerprints):
+            pair = (entry[1], entry[9])
+            if key in known:
+                seen.add(pair)
+            elif pair not in existing:
+                new.append(entry)
+            elif pair not in seen and not appended:
+                seen.add(pair)
+                pk, date, transacted, converted = existing[pair]
+                try:
+                    amounts = (decimal.Decimal(entry[7]), decimal.Decimal(entry[8]))
+                except decimal.InvalidOperation:
+                    continue
+                if amounts != (transacted, converted):
+                    updates[pk] = (Transaction(pk=pk, transacted_amount=entry[7], converted_amount=entry[8], fingerprint=key), date)
+        with transaction.atomic():
+            Transaction.objects.bulk_update([update[0] for update in updates.values()], ['transacted_amount', 'converted_amount', 'fingerprint'], batch_size=batch_size)
+
+        return new, [update[1] for update in updates.values()]
 
-        # Open file and append each entry in CSV file to the report list
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = csv.reader(f)
-            for entry in data:
-                original.append(entry)
+    def import_each(self, entries):
+        """Imports entries row by row and returns the document dates of the imported entries"""
 
-        # Removes trailing whitespaces in all data
-        original = [[data.strip() for data in entry] for entry in original]
+        # Declare list of imported dates and the dimension members known so far
+        imported = []
+        dimensions = DimensionResolver()
 
-        # Declare counter variables
-        imported = 0
-        
-        # Loops through every line in dataset; omits header row
-        for entry in original[1:]:
+        # Loops through every line in dataset
+        for entry in entries:
             # Initial Check: Exits function immediately if length of data entry incorrect
             if len(entry) != 14:
                 raise CommandError("Size of data entry is invalid!")
             else:
                 try:
-                    # Get or create Customer object
-                    customer, created = Customer.objects.get_or_create(
-                        name=entry[3],
-                    )
+                    try:
+                        # Get or create Customer object
+                        dimensions.resolve(Customer, entry[3])
 
-                    # Get or create Currency object
-                    currency, created = Currency.objects.get_or_create(
-                        code=entry[6],
-                    )
+                        # Get or create Currency object
+                        dimensions.resolve(Currency, entry[6])
 
-                    # Get or create CustomerAccount object
-                    custaccount, created = CustomerAccount.objects.get_or_create(
-                        code=entry[2],
-                        postal=entry[4],
-                        contact=entry[5],
-                        customer=customer,
-                        currency=currency,
-                    )
+                        # Get or create CustomerAccount object
+                        dimensions.resolve(CustomerAccount, entry[2], entry[4], entry[5], entry[3], entry[6])
 
-                    # Get or create SalesPerson object
-                    salesperson, created = SalesPerson.objects.get_or_create(
-                        code=entry[11],
-                        name=entry[12],
-                        contact=entry[13],
-                    )
-                    
-                    # Get or create Project object
-                    project, created = Project.objects.get_or_create(
-                        code=entry[9],
-                        custaccount=custaccount,
-                        salesperson=salesperson,
-                    )
+                        # Get or create SalesPerson object
+                        dimensions.resolve(SalesPerson, entry[11], entry[12], entry[13])
+
+                        # Get or create Project object
+                        dimensions.resolve(Project, entry[9], entry[2], entry[11])
+                    finally:
+                        # Create the members resolved before any conflict
+                        dimensions.flush()
 
                     # Get or create Document object
                     document, created = Document.objects.get_or_create(
@@ -80,21 +274,23 @@ class Command(BaseCommand):
                     )
 
                     # Get or create Location object
-                    location, created = Location.objects.get_or_create(
-                        code=entry[10],
-                    )
+                    dimensions.resolve(Location, entry[10])
+                    dimensions.flush()
 
                     # Create Transaction object
-                    transaction = Transaction.objects.create(
+                    Transaction.objects.create(
                         document=document,
-                        project=project,
-                        location=location,
+                        project_id=dimensions.pk(Project, entry[9]),
+                        location_id=dimensions.pk(Location, entry[10]),
                         transacted_amount=entry[7],
                         converted_amount=entry[8],
+                        doc_type=document.reference[:1].upper(),
+                        date=document.date,
+                        fingerprint=fingerprint(entry),
                     )
 
-                    # Increment counter
-                    imported += 1
+                    # Record imported date
+                    imported.append(document.date)
 
                 except IntegrityError:
                     # Handle output for violating UNIQUE constraint
@@ -103,5 +299,140 @@ class Command(BaseCommand):
                     # Handle output for unknown errors
                     self.stdout.write(self.style.NOTICE("An unknown error has occured: {}".format(entry)))
 
-        # Output result
-        self.stdout.write(self.style.SUCCESS("{}/{} entries were imported into the database".format(imported, len(original[1:]))))
+        self.report(dimensions)
+        return imported
+
+    def bulk_import(self, records, batch_size):
+        """Imports the records of entries with batched writes and returns the document dates of the imported entries
+
+        Every record is first resolved against in-memory copies of the dimension
+        tables, keyed by natural key, following the same get-or-create order as
+        the row-by-row import. Only the members that are actually missing are
+        then written with bulk_create, so the resulting rows are identical.
+        Dates, amounts and fingerprints come typed and validated in the records.
+        """
+
+        timings = []
+        started = time.perf_counter()
+
+        # Initial Check: Exits function immediately if length of any data entry incorrect
+        if any(record is None for record in records):
+            raise CommandError("Size of data entry is invalid!")
+
+        # Phase 1: Load existing dimension members, documents and transactions keyed by natural key
+        dimensions = DimensionResolver()
+        documents = {}
+        pairs = set()
+        for chunk in chunks(sorted({record.reference for record in records}), 500):
+            documents.update(Document.objects.filter(reference__in=chunk).values_list('reference', 'date'))
+            pairs.update(Transaction.objects.filter(document__reference__in=chunk).values_list('document__reference', 'project__code'))
+        timings.append(('load', time.perf_counter() - started))
+
+        # Phase 2: Resolve every record in memory, collecting the missing members in order of appearance
+        lap = time.perf_counter()
+        created = []
+        resolved = []
+        for record in records:
+            try:
+                # Get or create Customer object
+                dimensions.resolve(Customer, record.customer)
+
+                # Get or create Currency object
+                dimensions.resolve(Currency, record.currency)
+
+                # Get or create CustomerAccount object
+                dimensions.resolve(CustomerAccount, record.account, record.postal_code, record.telephone, record.customer, record.currency)
+
+                # Get or create SalesPerson object
+                dimensions.resolve(SalesPerson, record.salesperson, record.salesperson_name, record.contact)
+
+                # Get or create Project object
+                dimensions.resolve(Project, record.project, record.account, record.salesperson)
+
+                # Get or create Document object
+                if record.date is None:
+                    raise IntegrityError
+                if record.reference not in documents:
+                    documents[record.reference] = record.date
+                    created.append(Document(date=record.date, reference=record.reference))
+                elif documents[record.reference] != record.date:
+                    raise IntegrityError
+
+                # Get or create Location object
+                dimensions.resolve(Location, record.location)
+
+                # Validate Transaction object
+                if record.transacted is None or record.converted is None:
+                    raise ValueError("Invalid amount")
+                if (record.reference, record.project) in pairs:
+                    raise IntegrityError
+                pairs.add((record.reference, record.project))
+                resolved.append(record)
+
+            except IntegrityError:
+                # Handle output for violating UNIQUE constraint
+                self.stdout.write(self.style.NOTICE("Document already exists: {}".format(record)))
+            except:
+                # Handle output for unknown errors
+                self.stdout.write(self.style.NOTICE("An unknown error has occured: {}".format(record)))
+        timings.append(('resolve', time.perf_counter() - lap))
+
+        # Phase 3: Write missing members and transactions in a single database transaction
+        lap = time.perf_counter()
+        with transaction.atomic():
+            dimensions.flush(batch_size)
+            Document.objects.bulk_create(created, batch_size=batch_size)
+            document_ids = {}
+            for chunk in chunks(sorted({record.reference for record in resolved}), 500):
+                document_ids.update(Document.objects.filter(reference__in=chunk).values_list('reference', 'pk'))
+
+            # Create Transaction objects
+            Transaction.objects.bulk_create(
+                (
+                    Transaction(
+                        document_id=document_ids[record.reference],
+                        project_id=dimensions.pk(Project, record.project),
+                        location_id=dimensions.pk(Location, record.location),
+                        transacted_amount=record.transacted,
+                        converted_amount=record.converted,
+                        doc_type=record.reference[:1].upper(),
+                        date=documents[record.reference],
+                        fingerprint=record.fingerprint,
+                    )
+                    for record in resolved
+                ),
+                batch_size=batch_size,
+            )
+        timings.append(('write', time.perf_counter() - lap))
+
+        # Output timings
+        elapsed = time.perf_counter() - started
+        for phase, seconds in timings:
+            self.stdout.write("{:<8} {:>8.2f}s".format(phase, seconds))
+        self.stdout.write("{:<8} {:>8.2f}s ({:.0f} rows/s)".format('total', elapsed, len(records) / elapsed if elapsed else 0))
+        self.report(dimensions)
+
+        return [documents[record.reference] for record in resolved]
+
+    def report(self, dimensions):
+        """Outputs the hit rate of the dimension lookups"""
+        for name, hits, lookups in dimensions.stats():
+            self.stdout.write("{:<17} {:>8}/{:<8} hits ({:.1%})".format(name, hits, lookups, hits / lookups if lookups else 0))
+
+
+def digest(entries, prefix=None):
+    """Returns the hash of all entries and the hash of the first prefix entries"""
+    whole = hashlib.sha256()
+    partial = None
+    for index, entry in enumerate(entries):
+        if index == prefix:
+            partial = whole.hexdigest()
+        whole.update(("\x1f".join(entry) + "\n").encode("utf-8"))
+    if len(entries) == prefix:
+        partial = whole.hexdigest()
+    return whole.hexdigest(), partial
+
+def chunks(items, size):
+    """Yields successive slices of items with at most size elements"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
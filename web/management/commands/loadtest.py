@@ -0,0 +1,115 @@
+import json
+import time
+import threading
+import collections
+from importlib import import_module
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'measures dashboard throughput of a running server (runserver or gunicorn) under concurrent viewers'
+
+    def add_arguments(self, parser):
+        # Positional Arguments
+        parser.add_argument('url', type=str, help='base URL of the running server, e.g. http://127.0.0.1:8000')
+
+        # Optional Arguments
+        parser.add_argument('--user', type=str, action='append', help='username to sign in as; repeat to spread viewers across users')
+        parser.add_argument('--path', type=str, action='append', help='path requested by each viewer in turn; repeat for several (default /)')
+        parser.add_argument('--concurrency', type=int, default=8, help='number of simultaneous viewers')
+        parser.add_argument('--requests', type=int, default=200, help='total number of requests')
+        parser.add_argument('--revalidate', action='store_true', help='send the ETag of the previous response, as a refreshing browser would')
+        parser.add_argument('--output', type=str, default=None, help='path of a JSON results file')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username__in=options['user'] or [])
+        if not users or len(users) != len(set(options['user'])):
+            raise CommandError("Every --user must be an existing username!")
+        paths = options['path'] or ['/']
+
+        # Sign the viewers in with sessions created here, so the server needs no login round trip
+        cookies = ['{}={}'.format(settings.SESSION_COOKIE_NAME, self.session(user)) for user in users]
+
+        # Each viewer requests its paths in turn, keeping the ETag of each one
+        counter = iter(range(options['requests']))
+        counter_lock = threading.Lock()
+        results = []
+        def viewer(number):
+            etags = {}
+            while True:
+                with counter_lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                path = paths[i % len(paths)]
+                headers = {'Cookie': cookies[number % len(cookies)], 'Accept-Encoding': 'gzip'}
+                if options['revalidate'] and path in etags:
+                    headers['If-None-Match'] = etags[path]
+                results.append(self.fetch(options['url'].rstrip('/') + path, headers, etags, path))
+
+        lap = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(viewer, range(options['concurrency'])))
+        seconds = time.perf_counter() - lap
+
+        # Summarise latencies and statuses
+        latencies = sorted(latency for status, latency, size in results)
+        summary = {
+            'requests': len(results),
+            'concurrency': options['concurrency'],
+            'seconds': seconds,
+            'requests_per_second': len(results) / seconds if seconds else None,
+            'statuses': dict(collections.Counter(str(status) for status, latency, size in results)),
+            'bytes': sum(size for status, latency, size in results),
+            'latency': {name: percentile(latencies, q) for name, q in [('p50', 50), ('p90', 90), ('p99', 99), ('max', 100)]},
+        }
+
+        # Output result
+        self.stdout.write("{:<30} {:>10}".format('requests per second', formatted(summary['requests_per_second'])))
+        for name, latency in summary['latency'].items():
+            self.stdout.write("{:<30} {:>10} ms".format(name + ' latency', formatted(latency, 1000)))
+        for status, count in sorted(summary['statuses'].items()):
+            self.stdout.write("{:<30} {:>10}".format('status ' + status, count))
+        if options['output'] is not None:
+            with open(options['output'], "w+", encoding="utf-8") as f:
+                json.dump(summary, f, indent=4)
+        self.stdout.write(self.style.SUCCESS("{} requests were completed in {:.3f}s".format(len(results), seconds)))
+
+    def session(self, user):
+        """Returns the key of a new session signed in as a user"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    def fetch(self, url, headers, etags, path):
+        """Returns the status, seconds and body size of one request, remembering its ETag"""
+        lap = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+                body = response.read()
+                status = response.status
+                etags[path] = response.headers.get('ETag') or etags.get(path)
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except urllib.error.URLError as e:
+            raise CommandError("{} could not be reached: {}".format(url, e.reason))
+        return status, time.perf_counter() - lap, len(body)
+
+def percentile(values, q):
+    """Returns the nearest-rank percentile of sorted values, or None if there are none"""
+    if not values:
+        return None
+    return values[max(int(round(q / 100 * len(values))) - 1, 0)]
+
+def formatted(value, scale=1):
+    """Returns a scaled value to one decimal place, or n/a if there is none"""
+    return 'n/a' if value is None else '{:.1f}'.format(value * scale)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from web.rollup import refresh_rollup, refresh_summary, refresh_receivables
+from web.cache import bump_data_version
+from web.database import publish_replica
+from web.routers import primary
+
+class Command(BaseCommand):
+    help = 'rebuilds the monthly rollup, monthly summary and receivable snapshots from all transactions'
+
+    @primary()
+    def handle(self, *args, **options):
+        # Recompute every month
+        rows = refresh_rollup()
+        summaries = refresh_summary()
+        snapshots = refresh_receivables()
+        bump_data_version()
+        replica = publish_replica()
+
+        # Output result
+        self.stdout.write(self.style.SUCCESS("{} rollup rows were rebuilt".format(rows)))
+        self.stdout.write(self.style.SUCCESS("{} summary rows were rebuilt".format(summaries)))
+        self.stdout.write(self.style.SUCCESS("{} receivable snapshots were rebuilt".format(snapshots)))
+        if replica is not None:
+            self.stdout.write(self.style.SUCCESS("Read replica was published to {}".format(replica)))
@@ -0,0 +1,117 @@
+# Generated by Django 2.2 on 2026-10-18 11:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Currency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'currency',
+                'verbose_name_plural': 'currencies',
+            },
+        ),
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'customer',
+                'verbose_name_plural': 'customers',
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerAccount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, unique=True)),
+                ('postal', models.CharField(max_length=255)),
+                ('contact', models.CharField(max_length=255)),
+                ('currency', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Currency')),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Customer')),
+            ],
+            options={
+                'verbose_name': 'customer account',
+                'verbose_name_plural': 'customer accounts',
+            },
+        ),
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(max_length=255)),
+                ('reference', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'document',
+                'verbose_name_plural': 'documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'location',
+                'verbose_name_plural': 'locations',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesPerson',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('contact', models.CharField(max_length=255)),
+            ],
+            options={
+                'verbose_name': 'salesperson',
+                'verbose_name_plural': 'salespersons',
+            },
+        ),
+        migrations.CreateModel(
+            name='Project',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255, unique=True)),
+                ('custaccount', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.CustomerAccount')),
+                ('salesperson', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.SalesPerson')),
+            ],
+            options={
+                'verbose_name': 'project',
+                'verbose_name_plural': 'projects',
+            },
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transacted_amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('converted_amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('document', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Document')),
+                ('location', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Location')),
+                ('project', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Project')),
+            ],
+            options={
+                'verbose_name': 'transaction',
+                'verbose_name_plural': 'transactions',
+                'unique_together': {('document', 'project')},
+            },
+        ),
+    ]
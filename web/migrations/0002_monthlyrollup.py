@@ -0,0 +1,34 @@
+# Generated by Django 2.2 on 2026-10-18 11:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('doc_type', models.CharField(max_length=1)),
+                ('converted_amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('count', models.PositiveIntegerField()),
+                ('last_date', models.DateField()),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Customer')),
+                ('location', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Location')),
+                ('project', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Project')),
+                ('salesperson', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.SalesPerson')),
+            ],
+            options={
+                'verbose_name': 'monthly rollup',
+                'verbose_name_plural': 'monthly rollups',
+                'unique_together': {('month', 'customer', 'project', 'salesperson', 'location', 'doc_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0003_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='date',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='doc_type',
+            field=models.CharField(blank=True, default='', max_length=1),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['doc_type', 'date'], name='web_transac_doc_typ_7c0053_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['doc_type', 'project'], name='web_transac_doc_typ_481d3e_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Substr, Upper
+
+
+def backfill(apps, schema_editor):
+    """Copies the document date and reference type onto every transaction"""
+    Document = apps.get_model('web', 'Document')
+    Transaction = apps.get_model('web', 'Transaction')
+    document = Document.objects.filter(pk=OuterRef('document_id'))
+    Transaction.objects.filter(document__isnull=False).update(
+        date=Subquery(document.values('date')[:1]),
+        doc_type=Upper(Substr(Subquery(document.values('reference')[:1]), 1, 1)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0004_transaction_doc_type_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2 on 2026-10-18 11:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0006_import_checkpoint_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceivableSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('opening', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('invoiced', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('collected', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('closing', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Customer')),
+            ],
+            options={
+                'verbose_name': 'receivable snapshot',
+                'verbose_name_plural': 'receivable snapshots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='receivablesnapshot',
+            index=models.Index(fields=['month'], name='web_receiva_month_1fa6e0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='receivablesnapshot',
+            unique_together={('customer', 'month')},
+        ),
+    ]
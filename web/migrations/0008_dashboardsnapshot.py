@@ -0,0 +1,29 @@
+# Generated by Django 2.2 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0007_receivablesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.CharField(max_length=150, unique=True)),
+                ('version', models.PositiveIntegerField()),
+                ('script', models.TextField()),
+                ('divs', models.TextField()),
+                ('digest', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'dashboard snapshot',
+                'verbose_name_plural': 'dashboard snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2 on 2026-10-18 12:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('web', '0008_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('stamp', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'membership version',
+                'verbose_name_plural': 'membership versions',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0009_membershipversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='layout',
+            field=models.CharField(default='', max_length=64),
+        ),
+    ]
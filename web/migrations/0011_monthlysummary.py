@@ -0,0 +1,36 @@
+# Generated by Django 2.2 on 2026-10-18 13:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0010_dashboardsnapshot_layout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(max_length=16)),
+                ('month', models.DateField()),
+                ('doc_type', models.CharField(max_length=1)),
+                ('converted_amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('count', models.PositiveIntegerField()),
+                ('projects', models.PositiveIntegerField()),
+                ('last_date', models.DateField()),
+                ('currency', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Currency')),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Customer')),
+                ('location', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.Location')),
+                ('salesperson', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='web.SalesPerson')),
+            ],
+            options={
+                'verbose_name': 'monthly summary',
+                'verbose_name_plural': 'monthly summaries',
+                'unique_together': {('grain', 'month', 'customer', 'salesperson', 'location', 'currency', 'doc_type')},
+            },
+        ),
+    ]
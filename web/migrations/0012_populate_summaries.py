@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import F
+from django.utils import timezone
+from web.rollup import refresh_rollup, refresh_summary, refresh_receivables
+from web.routers import primary
+
+
+def populate(apps, schema_editor):
+    """Builds the monthly rollup, monthly summary and receivable snapshots of every transaction imported before they existed"""
+    # The replica still holds the data of before the upgrade, so every read goes to the primary
+    with primary():
+        refresh_rollup(apps=apps)
+        refresh_summary(apps=apps)
+        refresh_receivables(apps=apps)
+
+    # Invalidate chart outputs cached before the upgrade
+    DataVersion = apps.get_model('web', 'DataVersion')
+    if not DataVersion.objects.filter(pk=1).update(stamp=F('stamp') + 1, updated=timezone.now()):
+        DataVersion.objects.create(pk=1, stamp=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0011_monthlysummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 # Create your models here.
@@ -94,10 +95,139 @@ class Transaction(models.Model):
     transacted_amount = models.DecimalField(max_digits=15, decimal_places=2)
     converted_amount = models.DecimalField(max_digits=15, decimal_places=2)
 
+    # Denormalised from document for index range scans without joins
+    doc_type = models.CharField(max_length=1, blank=True, default='')
+    date = models.DateField(null=True)
+
+    # Hash of the source row for change detection on incremental imports
+    fingerprint = models.CharField(max_length=40, blank=True, default='', db_index=True)
+
     class Meta:
         verbose_name = 'transaction'
         verbose_name_plural = 'transactions'
         unique_together = (("document", "project"),)
+        indexes = [
+            models.Index(fields=['doc_type', 'date']),
+            models.Index(fields=['doc_type', 'project']),
+        ]
 
     def __str__(self):
         return "{self.document} {self.project}".format(self=self)
+
+
+class MonthlyRollup(models.Model):
+    month = models.DateField()
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True)
+    salesperson = models.ForeignKey(SalesPerson, on_delete=models.SET_NULL, null=True)
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True)
+    doc_type = models.CharField(max_length=1)
+    converted_amount = models.DecimalField(max_digits=20, decimal_places=2)
+    count = models.PositiveIntegerField()
+    last_date = models.DateField()
+
+    class Meta:
+        verbose_name = 'monthly rollup'
+        verbose_name_plural = 'monthly rollups'
+        unique_together = (("month", "customer", "project", "salesperson", "location", "doc_type"),)
+
+    def __str__(self):
+        return "{self.month:%Y-%m} {self.project} {self.doc_type}".format(self=self)
+
+
+class MonthlySummary(models.Model):
+    grain = models.CharField(max_length=16)
+    month = models.DateField()
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
+    salesperson = models.ForeignKey(SalesPerson, on_delete=models.SET_NULL, null=True)
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True)
+    currency = models.ForeignKey(Currency, on_delete=models.SET_NULL, null=True)
+    doc_type = models.CharField(max_length=1)
+    converted_amount = models.DecimalField(max_digits=20, decimal_places=2)
+    count = models.PositiveIntegerField()
+    projects = models.PositiveIntegerField()
+    last_date = models.DateField()
+
+    class Meta:
+        verbose_name = 'monthly summary'
+        verbose_name_plural = 'monthly summaries'
+        unique_together = (("grain", "month", "customer", "salesperson", "location", "currency", "doc_type"),)
+
+    def __str__(self):
+        return "{self.grain} {self.month:%Y-%m} {self.doc_type}".format(self=self)
+
+
+class ReceivableSnapshot(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True)
+    month = models.DateField()
+    opening = models.DecimalField(max_digits=20, decimal_places=2)
+    invoiced = models.DecimalField(max_digits=20, decimal_places=2)
+    collected = models.DecimalField(max_digits=20, decimal_places=2)
+    closing = models.DecimalField(max_digits=20, decimal_places=2)
+
+    class Meta:
+        verbose_name = 'receivable snapshot'
+        verbose_name_plural = 'receivable snapshots'
+        unique_together = (("customer", "month"),)
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return "{self.month:%Y-%m} {self.customer}".format(self=self)
+
+
+class DataVersion(models.Model):
+    stamp = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'data version'
+        verbose_name_plural = 'data versions'
+
+    def __str__(self):
+        return str(self.stamp)
+
+
+class ImportCheckpoint(models.Model):
+    path = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64)
+    rows = models.PositiveIntegerField()
+    last_date = models.DateField(null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'import checkpoint'
+        verbose_name_plural = 'import checkpoints'
+
+    def __str__(self):
+        return self.path
+
+
+class DashboardSnapshot(models.Model):
+    group = models.CharField(max_length=150, unique=True)
+    version = models.PositiveIntegerField()
+    layout = models.CharField(max_length=64, default='')
+    script = models.TextField()
+    divs = models.TextField()
+    digest = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'dashboard snapshot'
+        verbose_name_plural = 'dashboard snapshots'
+
+    def __str__(self):
+        return self.group
+
+
+class MembershipVersion(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    stamp = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'membership version'
+        verbose_name_plural = 'membership versions'
+
+    def __str__(self):
+        return str(self.stamp)
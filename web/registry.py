@@ -0,0 +1,97 @@
+import hashlib
+import importlib
+from django.core.exceptions import ImproperlyConfigured
+
+# Groups with a dashboard, in order of precedence for users in several of them
+GROUPS = ['CHIEF EXECUTIVES', 'FINANCE DEPARTMENT', 'CUSTOMER SERVICE DEPARTMENT']
+
+class Chart:
+    """A dashboard chart and the plot function that builds it
+
+    Each chart declares the groups that may see it with its (row, column)
+    slot on each group's dashboard, and the named datasets it reads. The
+    module defining the plot function, and Bokeh with it, is only imported
+    when the chart is first built.
+    """
+
+    def __init__(self, id, title, groups, datasets, module='web.charts'):
+        self.id = id
+        self.title = title
+        self.groups = groups
+        self.datasets = datasets
+        self.module = module
+
+    @property
+    def __name__(self):
+        return self.id
+
+    @property
+    def plot(self):
+        """Plot function of the chart, imported on first use"""
+        return getattr(importlib.import_module(self.module), self.id)
+
+    def __call__(self, datasets=None, filters=None):
+        return self.plot(datasets, filters)
+
+    def __repr__(self):
+        return 'Chart({!r})'.format(self.id)
+
+# Every dashboard chart; adding a chart here places it on the dashboards of its groups
+REGISTRY = [
+    Chart('total_income_by_month', "Total Income by Month",
+          {'CHIEF EXECUTIVES': (1, 1)}, ['income_by_month']),
+    Chart('total_projects_by_quarter', "Total Projects by Quarter",
+          {'CHIEF EXECUTIVES': (1, 2)}, ['projects_by_quarter']),
+    Chart('top_ten_customer_revenue_contribution_of_all_time', "Top 10 Customer Revenue Contribution of All-Time",
+          {'CHIEF EXECUTIVES': (2, 1), 'CUSTOMER SERVICE DEPARTMENT': (2, 1)}, ['top_ten_customer_income']),
+    Chart('top_ten_customer_revenue_contribution_last_twelve_months', "Top 10 Customer Revenue Contribution In The Last 12 Months",
+          {'CHIEF EXECUTIVES': (2, 2), 'CUSTOMER SERVICE DEPARTMENT': (2, 2)}, ['top_ten_customer_income_last_twelve_months']),
+    Chart('income_by_location', "Revenue By Location Per Year",
+          {'CHIEF EXECUTIVES': (3, 1), 'CUSTOMER SERVICE DEPARTMENT': (1, 1)}, ['location_income_by_year']),
+    Chart('revenue_by_salesperson_per_year', "Revenue By Salesperson Per Year",
+          {'CHIEF EXECUTIVES': (3, 2), 'CUSTOMER SERVICE DEPARTMENT': (1, 2)}, ['salesperson_income_by_year']),
+    Chart('accounts_receivables_balance_by_month', "Accounts Receivables Balance by Month",
+          {'CHIEF EXECUTIVES': (4, 1), 'FINANCE DEPARTMENT': (1, 1)}, ['receivables_by_month']),
+    Chart('accounts_receivables_turnover_by_month', "Accounts Receivables Turnover by Month",
+          {'CHIEF EXECUTIVES': (4, 2), 'FINANCE DEPARTMENT': (1, 2)}, ['receivables_by_month']),
+    Chart('top_ten_accounts_receivables_balance_by_customer', "Top 10 AR Balance by Customer",
+          {'CHIEF EXECUTIVES': (5, 1), 'FINANCE DEPARTMENT': (2, 1)}, ['customer_receivables']),
+    Chart('income_by_project_per_year', "Revenue By Projects Per Month",
+          {'CHIEF EXECUTIVES': (5, 2), 'FINANCE DEPARTMENT': (2, 2)}, ['project_income_by_month']),
+]
+
+def dashboard_rows(group):
+    """Returns the charts of a group's dashboard as rows of charts, ordered by slot"""
+    slots = sorted((chart.groups[group], chart) for chart in REGISTRY if group in chart.groups)
+    rows = []
+    for (row, column), chart in slots:
+        if not rows or rows[-1][0] != row:
+            rows.append((row, []))
+        rows[-1][1].append(chart)
+    return [charts for row, charts in rows]
+
+def title(id):
+    """Returns the title of a registered chart"""
+    return next(chart.title for chart in REGISTRY if chart.id == id)
+
+def layout_key(group):
+    """Returns a digest of the charts, slots and titles of a group's dashboard, which changes whenever the registry changes them"""
+    slots = sorted((chart.groups[group], chart.id, chart.title) for chart in REGISTRY if group in chart.groups)
+    return hashlib.sha256(repr(slots).encode('utf-8')).hexdigest()
+
+def check():
+    """Raises ImproperlyConfigured if a chart names an unknown group or dataset, repeats an id or shares a slot"""
+    from web.datasets import DATASETS
+    ids = set()
+    for chart in REGISTRY:
+        if chart.id in ids:
+            raise ImproperlyConfigured("Chart {} is registered twice".format(chart.id))
+        ids.add(chart.id)
+        for name in set(chart.groups) - set(GROUPS):
+            raise ImproperlyConfigured("Chart {} names unknown group {}".format(chart.id, name))
+        for name in set(chart.datasets) - set(DATASETS):
+            raise ImproperlyConfigured("Chart {} reads unknown dataset {}".format(chart.id, name))
+    for group in GROUPS:
+        slots = [chart.groups[group] for chart in REGISTRY if group in chart.groups]
+        if len(slots) != len(set(slots)):
+            raise ImproperlyConfigured("Two charts share a slot on the {} dashboard".format(group))
@@ -0,0 +1,67 @@
+import itertools
+import collections
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from web import registry
+from web.models import MembershipVersion
+
+# Session keys holding the resolved dashboard role of the signed-in user, None if the user has none, and the membership version it was resolved at
+ROLE_SESSION_KEY = '_dashboard_role'
+ROLE_VERSION_SESSION_KEY = '_dashboard_role_version'
+
+# Dashboard rows per role, in order of precedence; a role is the name of the user group that grants it
+ROLES = collections.OrderedDict((group, registry.dashboard_rows(group)) for group in registry.GROUPS)
+
+# Charts of each role's dashboard by id
+CHARTS = {role: {chart.id: chart for chart in itertools.chain(*rows)} for role, rows in ROLES.items()}
+
+# Seconds a membership version stays cached; with a cache local to each process, it bounds how long the other processes may keep a bumped version
+MEMBERSHIP_VERSION_TIMEOUT = 60
+
+def membership_key(user_id):
+    """Returns the cache key of the membership version stamp of a user"""
+    return 'membership:{}'.format(user_id)
+
+def membership_version(user_id):
+    """Returns the current membership version stamp of a user, from the cache when it holds it"""
+    version = cache.get(membership_key(user_id))
+    if version is None:
+        version = MembershipVersion.objects.filter(user=user_id).values_list('stamp', flat=True).first() or 0
+        cache.set(membership_key(user_id), version, MEMBERSHIP_VERSION_TIMEOUT)
+    return version
+
+def bump_membership_versions(user_ids):
+    """Increments the membership version stamp of the given users, so their sessions resolve their role again"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    MembershipVersion.objects.filter(user__in=user_ids).update(stamp=F('stamp') + 1)
+    known = set(MembershipVersion.objects.filter(user__in=user_ids).values_list('user', flat=True))
+    MembershipVersion.objects.bulk_create([MembershipVersion(user_id=pk, stamp=1) for pk in user_ids - known])
+
+    # Drop the cached stamps now and again once committed, in case a request cached the old stamp in between
+    keys = [membership_key(pk) for pk in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+def resolve_role(request):
+    """Returns the dashboard role of the signed-in user, resolved again only when their membership version has changed"""
+    version = membership_version(request.user.pk)
+    if ROLE_SESSION_KEY not in request.session or request.session.get(ROLE_VERSION_SESSION_KEY) != version:
+        names = set(request.user.groups.values_list('name', flat=True))
+        request.session[ROLE_SESSION_KEY] = next((role for role in ROLES if role in names), None)
+        request.session[ROLE_VERSION_SESSION_KEY] = version
+    return request.session[ROLE_SESSION_KEY]
+
+def membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bumps the membership versions of users added to or removed from a group, from either side of the relation"""
+    if action in ('post_add', 'post_remove'):
+        bump_membership_versions(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear':
+        bump_membership_versions(instance.user_set.values_list('pk', flat=True) if reverse else [instance.pk])
+
+def group_changed(sender, instance, **kwargs):
+    """Bumps the membership versions of the members of a group that is renamed or deleted"""
+    if instance.pk is not None:
+        bump_membership_versions(instance.user_set.values_list('pk', flat=True))
@@ -0,0 +1,196 @@
+import operator
+import functools
+import collections
+from dateutil.relativedelta import relativedelta
+from django.apps import apps as global_apps
+from django.db import connections, router, transaction
+from django.db.models import CharField, Sum, Count, Max, Q, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+# Dimensions kept by each grain of the monthly summary; 'all' answers any filter, the narrower grains the charts grouped by one dimension
+GRAINS = collections.OrderedDict([
+    ('all', ['customer', 'salesperson', 'location', 'currency']),
+    ('customer', ['customer']),
+    ('salesperson', ['salesperson']),
+    ('location', ['location']),
+    ('month', []),
+])
+
+# Transaction lookup of each summary dimension
+SOURCES = {
+    'customer': 'project__custaccount__customer',
+    'salesperson': 'project__salesperson',
+    'location': 'location',
+    'currency': 'project__custaccount__currency',
+}
+
+# Summary field of each value selected by the summary querysets
+SUMMARY_FIELDS = dict(
+    {source: dimension for dimension, source in SOURCES.items()},
+    level='grain',
+    total='converted_amount',
+    rows='count',
+    project_rows='projects',
+    latest='last_date',
+)
+
+def refresh_rollup(months=None, apps=global_apps):
+    """Recomputes the monthly rollup for the given months, or for all of history if none are given
+
+    Models come from the given app registry, so migrations can pass their
+    historical models. Returns the number of rollup rows written.
+    """
+    Transaction = apps.get_model('web', 'Transaction')
+    MonthlyRollup = apps.get_model('web', 'MonthlyRollup')
+
+    # Queryset
+    query = (
+        Transaction
+        .objects
+        .filter(date__isnull=False)
+        .annotate(month=TruncMonth('date'))
+        .values('month', 'project__custaccount__customer', 'project', 'project__salesperson', 'location', 'doc_type')
+        .annotate(total=Sum('converted_amount'), count=Count('id'), last_date=Max('date'))
+        .order_by()
+    )
+    rollups = MonthlyRollup.objects.all()
+    if months is not None:
+        months = sorted({month.replace(day=1) for month in months})
+        query = query.filter(functools.reduce(operator.or_, [Q(date__gte=month, date__lt=month + relativedelta(months=1)) for month in months], Q(pk=None)))
+        rollups = rollups.filter(month__in=months)
+
+    # Replace the affected months in one database transaction
+    with transaction.atomic():
+        # Creating rollup objects from Queryset
+        objs = [
+            MonthlyRollup(
+                month=i['month'],
+                customer_id=i['project__custaccount__customer'],
+                project_id=i['project'],
+                salesperson_id=i['project__salesperson'],
+                location_id=i['location'],
+                doc_type=i['doc_type'],
+                converted_amount=i['total'],
+                count=i['count'],
+                last_date=i['last_date'],
+            )
+            for i in query
+        ]
+
+        rollups.delete()
+        MonthlyRollup.objects.bulk_create(objs)
+
+    return len(objs)
+
+def refresh_summary(months=None, apps=global_apps):
+    """Recomputes the monthly summary for the given months, or for all of history if none are given
+
+    The summary totals transactions per month and document type without
+    projects, once for each grain in GRAINS. The full grain is summed from
+    the transactions and every narrower grain from the full grain, each with
+    one INSERT ... SELECT. Models come from the given app registry. Returns
+    the number of summary rows written.
+    """
+    Transaction = apps.get_model('web', 'Transaction')
+    MonthlySummary = apps.get_model('web', 'MonthlySummary')
+
+    # Querysets; the full grain first, as the others read it
+    transactions = Transaction.objects.filter(date__isnull=False)
+    summaries = MonthlySummary.objects.all()
+    if months is not None:
+        months = sorted({month.replace(day=1) for month in months})
+        transactions = transactions.filter(functools.reduce(operator.or_, [Q(date__gte=month, date__lt=month + relativedelta(months=1)) for month in months], Q(pk=None)))
+        summaries = summaries.filter(month__in=months)
+    queries = [
+        transactions
+        .annotate(level=Value('all', output_field=CharField()), month=TruncMonth('date'))
+        .values('level', 'month', 'doc_type', *SOURCES.values())
+        .annotate(total=Sum('converted_amount'), rows=Count('id'), project_rows=Count('project'), latest=Max('date'))
+        .order_by()
+    ]
+    for grain, dimensions in list(GRAINS.items())[1:]:
+        queries.append(
+            summaries
+            .filter(grain='all')
+            .annotate(level=Value(grain, output_field=CharField()))
+            .values('level', 'month', 'doc_type', *dimensions)
+            .annotate(total=Sum('converted_amount'), rows=Sum('count'), project_rows=Sum('projects'), latest=Max('last_date'))
+            .order_by()
+        )
+
+    # Replace the affected months in one database transaction
+    with transaction.atomic():
+        summaries.delete()
+        return sum(insert_rows(MonthlySummary, query, SUMMARY_FIELDS) for query in queries)
+
+def insert_rows(model, query, fields):
+    """Inserts the rows of a values queryset into a model with one INSERT ... SELECT, returning the number of rows inserted
+
+    Each selected value is written to the field of the same name, or to the
+    field the given mapping names for it.
+    """
+    connection = connections[router.db_for_write(model)]
+    sql, params = query.query.sql_with_params()
+    names = list(query.query.values_select) + list(query.query.annotation_select)
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(fields.get(name, name)).column) for name in names)
+    with connection.cursor() as cursor:
+        cursor.execute('INSERT INTO {} ({}) {}'.format(connection.ops.quote_name(model._meta.db_table), columns, sql), params)
+        return cursor.rowcount
+
+def refresh_receivables(months=None, apps=global_apps):
+    """Recomputes the monthly receivable snapshots from the earliest of the given months onwards, or for all of history if none are given
+
+    Balances are carried forward from the last snapshot before that month,
+    so earlier snapshots are left untouched. Every customer has a snapshot
+    for every month from its first activity to the latest month of the
+    summary. Models come from the given app registry. Returns the number of
+    snapshot rows written.
+    """
+    MonthlySummary = apps.get_model('web', 'MonthlySummary')
+    ReceivableSnapshot = apps.get_model('web', 'ReceivableSnapshot')
+
+    # Month to recompute from, never past the month after the last snapshot kept
+    start = min(month.replace(day=1) for month in months) if months else None
+    carried = ReceivableSnapshot.objects.filter(month__lt=start).aggregate(month=Max('month'))['month'] if start else None
+    if carried is None:
+        start = None
+    else:
+        start = min(start, carried + relativedelta(months=1))
+    opening = dict(ReceivableSnapshot.objects.filter(month=carried).values_list('customer', 'closing')) if carried else {}
+
+    # Queryset
+    query = (
+        MonthlySummary
+        .objects
+        .filter(grain='customer')
+        .values_list('customer', 'month')
+        .annotate(invoiced=Coalesce(Sum('converted_amount', filter=Q(doc_type='I')), 0), collected=Coalesce(-Sum('converted_amount', filter=Q(doc_type='B')), 0))
+        .order_by()
+    )
+    if start is not None:
+        query = query.filter(month__gte=start)
+    activity = collections.defaultdict(dict)
+    for customer, month, invoiced, collected in query:
+        activity[customer][month] = (invoiced, collected)
+    latest = MonthlySummary.objects.filter(grain='month').aggregate(month=Max('month'))['month']
+
+    # Creating snapshot objects, carrying each customer's balance month by month
+    objs = []
+    for customer in set(opening) | set(activity):
+        balance = opening.get(customer, 0)
+        month = start if customer in opening else min(activity[customer])
+        while latest is not None and month <= latest:
+            invoiced, collected = activity[customer].get(month, (0, 0))
+            objs.append(ReceivableSnapshot(customer_id=customer, month=month, opening=balance, invoiced=invoiced, collected=collected, closing=balance + invoiced - collected))
+            balance += invoiced - collected
+            month += relativedelta(months=1)
+
+    # Replace the affected months in one database transaction
+    snapshots = ReceivableSnapshot.objects.all()
+    if start is not None:
+        snapshots = snapshots.filter(month__gte=start)
+    with transaction.atomic():
+        snapshots.delete()
+        ReceivableSnapshot.objects.bulk_create(objs)
+
+    return len(objs)
@@ -0,0 +1,49 @@
+import os
+import threading
+import contextlib
+from django.conf import settings
+
+# Models the dashboards read; every other model is read from the primary
+ANALYTICS = {
+    'customer', 'currency', 'customeraccount', 'salesperson', 'project', 'document', 'location',
+    'transaction', 'monthlyrollup', 'monthlysummary', 'receivablesnapshot', 'dataversion',
+}
+
+# Depth of primary blocks entered by the current thread
+local = threading.local()
+
+class primary(contextlib.ContextDecorator):
+    """Sends every read of the current thread to the primary database while the block runs
+
+    Commands that read what they have just written, such as importdata and
+    rebuildrollup, must not see the replica published before they started.
+    """
+
+    def __enter__(self):
+        local.depth = getattr(local, 'depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc):
+        local.depth -= 1
+        return False
+
+class ReplicaRouter:
+    """Reads the analytics models from the read-only replica once it has been published, and writes everything to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'web' or model._meta.model_name not in ANALYTICS or getattr(local, 'depth', 0):
+            return 'default'
+        path = getattr(settings, 'DATABASE_REPLICA', None)
+        if not path or 'replica' not in settings.DATABASES or not os.path.exists(path):
+            return 'default'
+        return 'replica'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, so only the primary is migrated
+        return db == 'default'
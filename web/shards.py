@@ -0,0 +1,106 @@
+import io
+import os
+import csv
+import time
+import decimal
+import hashlib
+import collections
+from django.utils.dateparse import parse_date
+
+# Functions here run in worker processes, so they must not depend on Django being set up
+
+# Typed fields of an entry needed to import it; date and amounts are None when they are invalid
+Record = collections.namedtuple('Record', [
+    'reference', 'account', 'customer', 'postal_code', 'telephone', 'currency', 'project', 'location',
+    'salesperson', 'salesperson_name', 'contact', 'date', 'transacted', 'converted', 'fingerprint',
+])
+
+def split(filepath, count):
+    """Returns the header of a CSV file and up to count byte ranges of its data, aligned on line boundaries
+
+    Ranges are cut at line breaks, so fields must not contain line breaks,
+    which holds for the exports cleaned by cleandata.
+    """
+    with open(filepath, "rb") as f:
+        line = f.readline()
+        if not line:
+            return None, []
+        header = next(csv.reader([line.decode("utf-8")]))
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+
+        # Move each boundary forward to the start of the next line
+        bounds = [start]
+        for i in range(1, count):
+            f.seek(max(start + (size - start) * i // count, bounds[-1]))
+            if f.tell() > start:
+                f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+        bounds.append(size)
+
+    return header, [(begin, end) for begin, end in zip(bounds, bounds[1:]) if end > begin]
+
+def read(filepath, start, end):
+    """Returns the stripped entries in a byte range of a CSV file"""
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    return [[data.strip() for data in entry] for entry in csv.reader(io.StringIO(text, newline=""))]
+
+def parse(filepath, start, end, amounts=None):
+    """Returns the entries in a byte range of a CSV file, the seconds spent and the process id
+
+    Entries are stripped, and converted to records when the digits and
+    decimal places of the amounts are given.
+    """
+    started = time.perf_counter()
+    entries = read(filepath, start, end)
+    if amounts is not None:
+        entries = typed(entries, *amounts)
+    return entries, time.perf_counter() - started, os.getpid()
+
+def typed(entries, digits, places):
+    """Returns the record of each stripped entry, or None for an entry of the wrong size
+
+    Amounts are quantized to the given digits and decimal places, as the
+    amount fields store them. Equal text fields and dates share one object,
+    so each date is parsed once and the records of a shard pickle compactly.
+    """
+    strings = {}
+    dates = {}
+    context = decimal.Context(prec=digits)
+    exponent = decimal.Decimal(1).scaleb(-places)
+
+    def date(value):
+        if value not in dates:
+            try:
+                dates[value] = parse_date("{}-{}-{}".format(value[0:4], value[4:6], value[6:8]))
+            except ValueError:
+                dates[value] = None
+        return dates[value]
+
+    def amount(value):
+        try:
+            return decimal.Decimal(value).quantize(exponent, context=context)
+        except decimal.InvalidOperation:
+            return None
+
+    records = []
+    for entry in entries:
+        if len(entry) != 14:
+            records.append(None)
+            continue
+        records.append(Record(
+            entry[1],
+            *(strings.setdefault(data, data) for data in entry[2:7]),
+            *(strings.setdefault(data, data) for data in entry[9:14]),
+            date(entry[0]),
+            amount(entry[7]),
+            amount(entry[8]),
+            fingerprint(entry),
+        ))
+    return records
+
+def fingerprint(entry):
+    """Returns the hash identifying the contents of an entry"""
+    return hashlib.sha1("\x1f".join(entry).encode("utf-8")).hexdigest()
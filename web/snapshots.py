@@ -0,0 +1,42 @@
+import json
+import hashlib
+import collections
+from web import registry
+from web.models import DashboardSnapshot
+from web.cache import data_version, plot_components
+from web.datasets import Datasets
+
+def layout(rows):
+    """Returns the plot functions of dashboard rows keyed by div name, and the div names of each row"""
+    plots = collections.OrderedDict()
+    names = []
+    for row in rows:
+        names.append([])
+        for plot in row:
+            name = 'plot{}'.format(len(plots) + 1)
+            plots[name] = plot
+            names[-1].append(name)
+    return plots, names
+
+def build_snapshot(group, rows):
+    """Renders the components of a group's dashboard from the current data and stores them as its snapshot"""
+    version = data_version()
+    datasets = Datasets()
+    plots, names = layout(rows)
+
+    # Build every chart in turn; a snapshot must never hold a timed out placeholder
+    results = {name: plot_components(plot, version, datasets) for name, plot in plots.items()}
+    script = "\n".join(script for script, div in results.values())
+    divs = json.dumps([{name: results[name][1] for name in row} for row in names])
+
+    return DashboardSnapshot.objects.update_or_create(group=group, defaults={
+        'version': version,
+        'layout': registry.layout_key(group),
+        'script': script,
+        'divs': divs,
+        'digest': hashlib.sha256((script + divs).encode('utf-8')).hexdigest(),
+    })[0]
+
+def current_snapshot(group):
+    """Returns the snapshot of a group's dashboard if it was built from the current data and chart registry, or None"""
+    return DashboardSnapshot.objects.filter(group=group, version=data_version(), layout=registry.layout_key(group)).first()
@@ -0,0 +1,79 @@
+import random
+import datetime
+
+# Column headers expected by cleandata and importdata
+header = ['DocDate', 'DocRef', 'AcCode', 'Customer Name', 'Postal Code', 'TelNo', 'AcCur', 'AcCurWTaxAmt', 'HomeWTaxAmt', 'ProjectCode', 'Location', 'Sales Person', 'SalesPerson Name', 'Sales contact']
+
+# Vocabulary for customer and salesperson names
+fruits = ['Apple', 'Apricot', 'Avocado', 'Banana', 'Blackberry', 'Blueberry', 'Cherry', 'Coconut', 'Cranberry', 'Durian', 'Fig', 'Grape', 'Guava', 'Jackfruit', 'Kiwifruit', 'Lemon', 'Lime', 'Longan', 'Lychee', 'Mango', 'Mangosteen', 'Melon', 'Orange', 'Papaya', 'Peach', 'Pear', 'Persimmon', 'Pineapple', 'Plum', 'Pomegranate', 'Pomelo', 'Rambutan', 'Raspberry', 'Soursop', 'Starfruit', 'Strawberry', 'Tangerine', 'Watermelon']
+trades = ['Assist', 'Automation', 'Control', 'Dealer', 'Distribution', 'Expert', 'Export', 'Import', 'Importer', 'Innovation', 'Logistics', 'Marketing', 'Master', 'Relay', 'Specialist', 'Trading', 'United']
+salespersons = ['Ali', 'Bala', 'Charles', 'Danny', 'Eugiene', 'John', 'Lily', 'Mary', 'Nadia', 'Omar', 'Priya', 'Quentin', 'Rachel', 'Samuel', 'Tina', 'Umar']
+
+# Document prefixes that cleandata omits
+omitted_prefixes = ['C', 'D', 'J']
+
+def generate_ledger(rows, customers=300, salespersons_count=8, locations=5, start=datetime.date(2016, 1, 1), days=912, usd_share=0.84, omitted_share=0.05, seed=0):
+    """Yields rows of a synthetic ledger export in the cleandata input format
+
+    Every project belongs to one customer account and salesperson and is
+    invoiced once and collected once or twice, so projects scale with rows
+    while customers, salespersons and locations stay at the given counts.
+    """
+
+    rng = random.Random(seed)
+
+    # Dimension members
+    accounts = []
+    for i in range(customers):
+        name = "{} {} Pte Ltd".format(fruits[i % len(fruits)], trades[i // len(fruits) % len(trades)])
+        if i >= len(fruits) * len(trades):
+            name = "{} {} {} Pte Ltd".format(fruits[i % len(fruits)], trades[i // len(fruits) % len(trades)], i // (len(fruits) * len(trades)) + 1)
+        currency = 'USD' if rng.random() < usd_share else 'SGD'
+        accounts.append(("{}{:04d}{}".format(name[0], i + 1, currency), name, "{:06d}".format(rng.randrange(10000, 999999)), "9{:07d}".format(rng.randrange(10 ** 7)), currency))
+    sellers = [("S{:03d}".format(90 + i), salespersons[i % len(salespersons)] + ("" if i < len(salespersons) else " {}".format(i // len(salespersons) + 1)), "8508{:04d}".format(rng.randrange(10 ** 4))) for i in range(salespersons_count)]
+
+    produced = 0
+    project = 0
+    document = 0
+    while produced < rows:
+        project += 1
+        account = rng.choice(accounts)
+        seller = rng.choice(sellers)
+        location = str(rng.randrange(1, locations + 1))
+        invoiced = start + datetime.timedelta(days=rng.randrange(days))
+        amount = round(rng.lognormvariate(11, 1.2), 2)
+        rate = round(rng.uniform(1.3, 1.42), 4) if account[4] == 'USD' else 1
+        project_code = "P{}".format(5000 + project)
+
+        # One invoice followed by one or two collections
+        documents = [('I', invoiced, amount)]
+        if rng.random() < 0.3:
+            part = round(amount * rng.uniform(0.2, 0.8), 2)
+            documents += [('B', invoiced + datetime.timedelta(days=rng.randrange(1, 60)), part), ('B', invoiced + datetime.timedelta(days=rng.randrange(60, 120)), round(amount - part, 2))]
+        else:
+            documents.append(('B', invoiced + datetime.timedelta(days=rng.randrange(1, 120)), amount))
+
+        for prefix, date, value in documents:
+            if produced >= rows:
+                break
+            document += 1
+            if rng.random() < omitted_share:
+                prefix = rng.choice(omitted_prefixes)
+            sign = -1 if prefix == 'B' else 1
+            yield [
+                date.strftime("%Y%m%d"),
+                "{}{:09d}".format(prefix, document),
+                account[0],
+                account[1],
+                account[2],
+                account[3],
+                account[4],
+                "{:.2f}".format(sign * value),
+                "{:.2f}".format(sign * round(value * rate, 2)),
+                project_code,
+                location,
+                seller[0],
+                seller[1],
+                seller[2],
+            ]
+            produced += 1
@@ -1,3 +1,529 @@
-from django.test import TestCase
+import io
+import os
+import csv
+import datetime
+import tempfile
+import collections
+from unittest import mock
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User, Group
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from web.models import *
+from web.cache import bump_data_version, cached_components, data_version
+from web.database import replica_migrated
+from web.datasets import Datasets
+from web.filters import ChartFilter
+from web import charts, registry
+from web.roles import resolve_role
+from web.routers import primary
+from web.snapshots import current_snapshot
+from web.synthetic import header, generate_ledger
+from web.timing import measure
 
-# Create your tests here.
+def summaries():
+    """Returns the rollup, summary and receivable snapshot rows, in a stable order"""
+    return (
+        sorted(MonthlyRollup.objects.values_list('month', 'customer__name', 'project__code', 'salesperson__code', 'location__code', 'doc_type', 'converted_amount', 'count', 'last_date')),
+        sorted(MonthlySummary.objects.values_list('grain', 'month', 'customer__name', 'salesperson__code', 'location__code', 'currency__code', 'doc_type', 'converted_amount', 'count', 'projects', 'last_date'), key=str),
+        sorted(ReceivableSnapshot.objects.values_list('customer__name', 'month', 'opening', 'invoiced', 'collected', 'closing')),
+    )
+
+@override_settings(DATABASE_REPLICA=None)
+class CommandTestCase(TestCase):
+    """Runs management commands inside a temporary working directory, with an empty chart cache"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        cache.clear()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def write(self, filename, entries, columns=header):
+        """Writes a CSV file with a header and returns its path"""
+        with open(filename, "w+", encoding="utf-8", newline="") as f:
+            pointer = csv.writer(f)
+            pointer.writerow(columns)
+            pointer.writerows(entries)
+        return os.path.abspath(filename)
+
+    def call(self, name, *args, **options):
+        """Runs a management command and returns its output"""
+        stdout = io.StringIO()
+        call_command(name, *args, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def sanitise(self, rows=400, seed=0):
+        """Cleans a synthetic export and returns the header and entries of the sanitised file"""
+        self.call('cleandata', self.write('raw.csv', generate_ledger(rows, seed=seed)))
+        with open('sanitised.csv', "r", encoding="utf-8") as f:
+            original = list(csv.reader(f))
+        return original[0], original[1:]
+
+class CleanTests(CommandTestCase):
+
+    def outputs(self):
+        """Returns the contents of the sanitised and omitted files"""
+        with open('sanitised.csv', "r", encoding="utf-8") as s, open('omitted.csv', "r", encoding="utf-8") as o:
+            return s.read(), o.read()
+
+    def test_columnar_mode_matches_row_mode(self):
+        entries = list(generate_ledger(500, seed=1)) + [
+            ['20170105', ' i-90001 ', 'A0001-USD', 'Apple Trading Pte Ltd ', '123456', '91234567', 'USD', '-100.00', '135.50', 'P9001', '1', 'S090', 'Ali', '85081234'],
+            ['20170210', 'b90002', 'A0001USD', 'Apple Trading Pte Ltd', '123456', '91234567', 'usd', '100.00', '135.50', 'P9001', '1', 'S090', 'Ali', '85081234'],
+            ['20170301', 'I90003', 'B0002SGD', 'Banana Export Pte Ltd', '654321', '97654321', 'SGD', '80.00', '80.10', 'P9002', '2', 'S091', 'Bala', '85084321'],
+            ['20151231', 'C90004', 'B0002SGD', 'Banana Export Pte Ltd', '654321', '97654321', 'SGD', '0', '0', 'P9002', '2', 'S091', 'Bala', '85084321'],
+        ]
+        filepath = self.write('raw.csv', entries)
+        self.call('cleandata', filepath)
+        expected = self.outputs()
+        self.call('cleandata', filepath, columnar=True, chunk_size=64)
+        self.assertEqual(self.outputs(), expected)
+        self.assertIn('i90001', expected[0])
+        self.assertIn('-100.0', expected[0].split('b90002')[1].splitlines()[0])
+        self.assertIn('C90004', expected[1])
+
+class ImportTests(CommandTestCase):
+
+    def transactions(self):
+        """Returns every imported transaction with its dimensions, in a stable order"""
+        return sorted(Transaction.objects.values_list(
+            'document__reference', 'document__date', 'project__code', 'project__custaccount__code',
+            'project__custaccount__customer__name', 'project__custaccount__currency__code', 'project__salesperson__code',
+            'location__code', 'transacted_amount', 'converted_amount', 'doc_type', 'date',
+        ))
+
+    def reset(self):
+        """Deletes every imported row"""
+        for model in [Transaction, MonthlyRollup, MonthlySummary, ReceivableSnapshot, ImportCheckpoint, Document, Project, CustomerAccount, Customer, Currency, SalesPerson, Location]:
+            model.objects.all().delete()
+
+    def test_import_modes_produce_same_transactions(self):
+        columns, entries = self.sanitise()
+        filepath = self.write('ledger.csv', entries, columns)
+        self.call('importdata', filepath)
+        expected = self.transactions()
+        self.assertEqual(len(expected), len(entries))
+        for options in [{'bulk': True}, {'workers': 2}, {'incremental': True}]:
+            with self.subTest(**options):
+                self.reset()
+                self.call('importdata', filepath, **options)
+                self.assertEqual(self.transactions(), expected)
+
+    def test_clean_import_matches_cleandata_then_importdata(self):
+        raw = self.write('raw.csv', generate_ledger(400, seed=0))
+        self.call('cleandata', raw)
+        self.call('importdata', 'sanitised.csv', bulk=True)
+        expected = self.transactions()
+        with open('omitted.csv', "r", encoding="utf-8") as f:
+            omitted = list(csv.reader(f))
+
+        self.reset()
+        self.call('importdata', raw, bulk=True, clean=True, rejects='rejects.csv')
+        self.assertEqual(self.transactions(), expected)
+
+        # Rejects carry the same entries and reasons as omitted.csv
+        with open('rejects.csv', "r", encoding="utf-8") as f:
+            rejects = list(csv.reader(f))
+        self.assertEqual(rejects[0][-1], 'FailedConditions')
+        self.assertTrue(len(rejects) > 1 and all(entry[-1] for entry in rejects[1:]))
+        self.assertEqual(rejects, omitted)
+
+    def test_import_and_rebuild_refresh_cached_charts(self):
+        columns, entries = self.sanitise()
+        filepath = self.write('ledger.csv', entries[:len(entries) // 2], columns)
+        self.call('importdata', filepath, bulk=True)
+        plots = {'plot': charts.total_income_by_month}
+
+        def income():
+            """Returns the total of the monthly income columns served to the charts"""
+            return round(float(Datasets(ChartFilter()).get('income_by_month')['total'].sum()), 2)
+
+        def expected():
+            """Returns the total invoiced amount summed from the transactions"""
+            return round(float(sum(Transaction.objects.filter(doc_type='I').values_list('converted_amount', flat=True))), 2)
+
+        with mock.patch('web.cache.measure', wraps=measure) as build:
+            first = income()
+            cached_components(plots)
+            cached_components(plots)
+            self.assertEqual(build.call_count, 1)
+
+            # An import bumps the data version, so columns and components are built again
+            version = data_version()
+            self.write('ledger.csv', entries, columns)
+            self.call('importdata', filepath, bulk=True)
+            self.assertGreater(data_version(), version)
+            self.assertNotEqual(income(), first)
+            self.assertEqual(income(), expected())
+            cached_components(plots)
+            self.assertEqual(build.call_count, 2)
+
+            # So does rebuildrollup, which picks up a transaction changed outside importdata
+            Transaction.objects.filter(pk=Transaction.objects.filter(doc_type='I').first().pk).update(converted_amount=F('converted_amount') + 1000)
+            stale = income()
+            self.assertNotEqual(stale, expected())
+            version = data_version()
+            self.call('rebuildrollup')
+            self.assertGreater(data_version(), version)
+            self.assertEqual(income(), expected())
+            cached_components(plots)
+            self.assertEqual(build.call_count, 3)
+
+    def test_incremental_import_of_appended_entries(self):
+        columns, entries = self.sanitise()
+        filepath = self.write('ledger.csv', entries, columns)
+        self.call('importdata', filepath)
+        expected = self.transactions()
+
+        self.reset()
+        self.write('ledger.csv', entries[:len(entries) // 2], columns)
+        self.call('importdata', filepath, incremental=True)
+        self.write('ledger.csv', entries, columns)
+        self.call('importdata', filepath, incremental=True)
+        self.assertEqual(self.transactions(), expected)
+
+        # Rollup and receivables refreshed month by month match a full rebuild
+        refreshed = summaries()
+        self.call('rebuildrollup')
+        self.assertEqual(summaries(), refreshed)
+
+    def test_incremental_import_of_changed_entries(self):
+        columns, entries = self.sanitise()
+        filepath = self.write('ledger.csv', entries, columns)
+        self.call('importdata', filepath, incremental=True)
+
+        # Change the amounts of the first entry and repeat the second with other amounts
+        changed = [entry[:] for entry in entries]
+        changed[0][7:9] = [str(float(amount) * 2) for amount in changed[0][7:9]]
+        duplicate = changed[1][:7] + [str(float(amount) * 3) for amount in changed[1][7:9]] + changed[1][9:]
+        changed.insert(2, duplicate)
+        self.write('ledger.csv', changed, columns)
+        self.call('importdata', filepath, incremental=True)
+        imported = self.transactions()
+
+        self.reset()
+        self.call('importdata', filepath, bulk=True)
+        self.assertEqual(imported, self.transactions())
+
+    def test_sharded_import_skips_invalid_entries_as_bulk_import(self):
+        columns, entries = self.sanitise()
+        entries[0][0] = '20161332'
+        entries[1][7] = 'n/a'
+        filepath = self.write('ledger.csv', entries, columns)
+        self.call('importdata', filepath, bulk=True)
+        expected = self.transactions()
+        self.assertEqual(len(expected), len(entries) - 2)
+
+        self.reset()
+        self.call('importdata', filepath, workers=2)
+        self.assertEqual(self.transactions(), expected)
+
+    def test_sharded_import_of_header_only_file(self):
+        filepath = self.write('empty.csv', [])
+        output = self.call('importdata', filepath, workers=2)
+        self.assertIn("0/0 entries were imported", output)
+        self.assertFalse(Transaction.objects.exists())
+
+class DatasetTests(CommandTestCase):
+
+    def setUp(self):
+        super().setUp()
+        columns, entries = self.sanitise(600)
+        self.call('importdata', self.write('ledger.csv', entries, columns), bulk=True)
+        self.latest = Transaction.objects.dates('date', 'month').last()
+
+    def dataset(self, name, fields, **filters):
+        """Returns the rows of a dataset as tuples of the given fields"""
+        columns = Datasets(ChartFilter(**filters)).get(name)
+        return [tuple(round(value, 2) if isinstance(value, float) else value for value in row) for row in zip(*(columns[field].tolist() for field in fields))]
+
+    def receivables(self, **lookups):
+        """Returns invoiced, collected and closing totals per month from the first matching transaction to the latest, summed from the transactions"""
+        totals = collections.defaultdict(collections.Counter)
+        for date, doc_type, amount in Transaction.objects.filter(**lookups).values_list('date', 'doc_type', 'converted_amount'):
+            totals[date.replace(day=1)][doc_type] += amount
+        rows = collections.OrderedDict()
+        closing = 0
+        month = min(totals)
+        while month <= self.latest:
+            closing += totals[month]['I'] + totals[month]['B']
+            rows[month] = (month, round(float(totals[month]['I']), 2), round(float(-totals[month]['B']), 2), round(float(closing), 2))
+            month += relativedelta(months=1)
+        return rows
+
+    def test_receivables_match_transactions(self):
+        fields = ['month', 'invoiced', 'collected', 'closing']
+
+        # Receivable snapshots, unfiltered and by customer
+        self.assertEqual(self.dataset('receivables_by_month', fields), list(self.receivables().values()))
+        customer = Customer.objects.order_by('name').first().name
+        self.assertEqual(self.dataset('receivables_by_month', fields, customer=customer), list(self.receivables(project__custaccount__customer__name=customer).values()))
+
+        # Rollup fallback for filters the snapshots cannot apply, which lists active months only
+        expected = self.receivables(location__code='1')
+        rows = self.dataset('receivables_by_month', fields, location='1')
+        self.assertTrue(rows)
+        self.assertEqual(rows, [expected[row[0]] for row in rows])
+
+    def test_filtered_income_matches_transactions(self):
+        start, end = self.latest - relativedelta(months=11), self.latest - relativedelta(months=2)
+        totals = collections.Counter()
+        for date, code, amount in Transaction.objects.filter(doc_type='I', date__gte=start, date__lt=end + relativedelta(months=1), project__salesperson__name='Bala').values_list('date', 'project__code', 'converted_amount'):
+            totals[date.replace(day=1), code] += amount
+        expected = sorted((month, code, round(float(total), 2)) for (month, code), total in totals.items())
+        self.assertTrue(expected)
+        self.assertEqual(sorted(self.dataset('project_income_by_month', ['month', 'project__code', 'total'], start=start, end=end, salesperson='Bala')), expected)
+
+    def test_monthly_income_matches_transactions(self):
+        for filters, lookups in [({}, {}), ({'location': '1'}, {'location__code': '1'})]:
+            with self.subTest(**filters):
+                totals = collections.Counter()
+                for date, amount in Transaction.objects.filter(doc_type='I', **lookups).values_list('date', 'converted_amount'):
+                    totals[date.replace(day=1)] += amount
+                expected = [(month, round(float(total), 2)) for month, total in sorted(totals.items())]
+                self.assertTrue(expected)
+                self.assertEqual(self.dataset('income_by_month', ['month', 'total'], **filters), expected)
+
+    def test_yearly_income_matches_transactions_at_every_grain(self):
+        for name, field, lookup in [('location_income_by_year', 'location__code', 'location__code'), ('salesperson_income_by_year', 'salesperson__name', 'project__salesperson__name')]:
+            for filters in [{}, {'currency': 'SGD'}]:
+                with self.subTest(name, **filters):
+                    lookups = {'project__custaccount__currency__code': filters['currency']} if filters else {}
+                    totals = collections.Counter()
+                    for date, key, amount in Transaction.objects.filter(doc_type='I', **lookups).values_list('date', lookup, 'converted_amount'):
+                        totals[date.replace(month=1, day=1), key] += amount
+                    expected = sorted((year, key, round(float(total), 2)) for (year, key), total in totals.items())
+                    self.assertTrue(expected)
+                    self.assertEqual(sorted(self.dataset(name, ['year', field, 'total'], **filters)), expected)
+
+class ChartViewTests(CommandTestCase):
+
+    def setUp(self):
+        super().setUp()
+        columns, entries = self.sanitise(200)
+        self.call('importdata', self.write('ledger.csv', entries, columns), bulk=True)
+        self.user = User.objects.create(username='viewer')
+        self.user.groups.add(Group.objects.create(name='FINANCE DEPARTMENT'))
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_unknown_chart_is_not_found(self):
+        self.assertEqual(self.client.get(reverse('web:chart', args=['unknown'])).status_code, 404)
+
+    def test_chart_outside_role_is_forbidden(self):
+        self.assertEqual(self.client.get(reverse('web:chart', args=['total_income_by_month'])).status_code, 403)
+        self.user.groups.clear()
+        self.assertEqual(self.client.get(reverse('web:chart', args=['accounts_receivables_balance_by_month'])).status_code, 403)
+
+    def test_chart_of_role_is_served_and_revalidated(self):
+        url = reverse('web:chart', args=['accounts_receivables_balance_by_month'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('doc', response.json())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Another filter or new data is served again
+        self.assertEqual(self.client.get(url, {'currency': 'SGD'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        bump_data_version()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+class RoleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='viewer')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = SessionStore()
+
+    def test_role_is_kept_in_session(self):
+        self.user.groups.add(Group.objects.create(name='FINANCE DEPARTMENT'))
+        self.assertEqual(resolve_role(self.request), 'FINANCE DEPARTMENT')
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_role(self.request), 'FINANCE DEPARTMENT')
+
+    def test_role_follows_membership_changes(self):
+        finance = Group.objects.create(name='FINANCE DEPARTMENT')
+        self.user.groups.add(finance)
+        self.assertEqual(resolve_role(self.request), 'FINANCE DEPARTMENT')
+        Group.objects.create(name='CHIEF EXECUTIVES').user_set.add(self.user)
+        self.assertEqual(resolve_role(self.request), 'CHIEF EXECUTIVES')
+        self.user.groups.clear()
+        self.assertIsNone(resolve_role(self.request))
+        finance.user_set.add(self.user)
+        self.assertEqual(resolve_role(self.request), 'FINANCE DEPARTMENT')
+        finance.name = 'FORMER FINANCE DEPARTMENT'
+        finance.save()
+        self.assertIsNone(resolve_role(self.request))
+
+class LoadTestTests(TestCase):
+
+    def test_no_requests_report_no_latency(self):
+        User.objects.create(username='viewer')
+        out = io.StringIO()
+        call_command('loadtest', 'http://127.0.0.1:8000', user=['viewer'], requests=0, stdout=out)
+        self.assertIn("p50 latency", out.getvalue())
+        self.assertIn("n/a ms", out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_viewers_are_signed_in_with_the_session_engine(self):
+        User.objects.create(username='viewer')
+        call_command('loadtest', 'http://127.0.0.1:8000', user=['viewer'], requests=0, stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), 0)
+
+class RouterTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.replica = os.path.join(directory.name, 'replica.sqlite3')
+        open(self.replica, 'w').close()
+        settings = override_settings(DATABASE_REPLICA=self.replica)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_analytics_reads_go_to_replica(self):
+        for model in [Transaction, Customer, MonthlySummary, ReceivableSnapshot, DataVersion]:
+            self.assertEqual(router.db_for_read(model), 'replica')
+
+    def test_writes_and_other_reads_go_to_primary(self):
+        for model in [Transaction, MonthlySummary, DataVersion]:
+            self.assertEqual(router.db_for_write(model), 'default')
+        for model in [User, Group, Session, MembershipVersion, DashboardSnapshot, ImportCheckpoint]:
+            self.assertEqual(router.db_for_read(model), 'default')
+
+    def test_unpublished_replica_is_not_read(self):
+        os.remove(self.replica)
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+
+    def test_primary_overrides_routing(self):
+        with primary():
+            self.assertEqual(router.db_for_read(Transaction), 'default')
+            with primary():
+                self.assertEqual(router.db_for_read(Transaction), 'default')
+            self.assertEqual(router.db_for_read(Transaction), 'default')
+        self.assertEqual(router.db_for_read(Transaction), 'replica')
+        self.assertEqual(primary()(lambda: router.db_for_read(Transaction))(), 'default')
+
+    def test_migrate_publishes_existing_replica(self):
+        with mock.patch('web.database.publish_replica', return_value=self.replica) as publish:
+            with mock.patch.object(connection, 'is_in_memory_db', return_value=False):
+                replica_migrated(None, using='default', verbosity=0, plan=[])
+                publish.assert_not_called()
+                replica_migrated(None, using='default', verbosity=0, plan=[('migration', False)])
+                publish.assert_called_once_with()
+
+            # Migrating the in-memory test database never touches the replica
+            replica_migrated(None, using='default', verbosity=0, plan=[('migration', False)])
+            publish.assert_called_once_with()
+
+@override_settings(DATABASE_REPLICA=None)
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='viewer')
+        user.groups.add(Group.objects.create(name='FINANCE DEPARTMENT'))
+        self.client = Client()
+        self.client.force_login(user)
+        bump_data_version()
+
+    def snapshot(self, digest, layout=None):
+        """Stores a snapshot of the finance dashboard for the current data"""
+        return DashboardSnapshot.objects.update_or_create(group='FINANCE DEPARTMENT', defaults={
+            'version': data_version(), 'layout': layout or registry.layout_key('FINANCE DEPARTMENT'), 'script': '', 'divs': '[{"plot1": "<div>%s</div>"}]' % digest, 'digest': digest,
+        })[0]
+
+    def test_snapshot_digest_validates_index(self):
+        self.snapshot('a')
+        response = self.client.get('/')
+        self.assertContains(response, '<div>a</div>')
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.snapshot('b')
+        changed = self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(changed, '<div>b</div>')
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_live_index_is_validated_with_release_and_layout(self):
+        response = self.client.get('/')
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with override_settings(RELEASE='next'):
+            self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        with mock.patch.object(registry, 'layout_key', return_value='0' * 64):
+            self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_only_dashboard_views_are_compressed(self):
+        self.snapshot('a')
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(self.client.get('/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.client.logout()
+        self.assertFalse(self.client.get(reverse('web:login'), HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding'))
+
+    def test_snapshot_of_another_layout_is_not_served(self):
+        self.snapshot('a', layout='0' * 64)
+        self.assertIsNone(current_snapshot('FINANCE DEPARTMENT'))
+        self.snapshot('a')
+        self.assertIsNotNone(current_snapshot('FINANCE DEPARTMENT'))
+
+@override_settings(DATABASE_REPLICA=None)
+class BackfillMigrationTests(TransactionTestCase):
+
+    def migrate(self, *targets):
+        """Migrates the database to the given migrations and returns the models at that state"""
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(list(targets))
+        return executor.loader.project_state(list(targets)).apps
+
+    def test_backfill_copies_document_date_and_type(self):
+        apps = self.migrate(('web', '0004_transaction_doc_type_date'))
+        Document = apps.get_model('web', 'Document')
+        OldTransaction = apps.get_model('web', 'Transaction')
+        invoice = Document.objects.create(date=datetime.date(2017, 3, 5), reference='i1001')
+        collection = Document.objects.create(date=datetime.date(2017, 4, 6), reference='B1002')
+        OldTransaction.objects.create(document=invoice, transacted_amount=10, converted_amount=10)
+        OldTransaction.objects.create(document=collection, transacted_amount=-10, converted_amount=-10)
+        OldTransaction.objects.create(document=None, transacted_amount=1, converted_amount=1)
+
+        self.migrate(*MigrationExecutor(connection).loader.graph.leaf_nodes())
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('document__reference', 'doc_type', 'date'), key=str),
+            sorted([('i1001', 'I', datetime.date(2017, 3, 5)), ('B1002', 'B', datetime.date(2017, 4, 6)), (None, '', None)], key=str),
+        )
+
+    def test_upgrade_builds_summaries_of_existing_transactions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            raw = os.path.join(directory, 'raw.csv')
+            with open(raw, "w+", encoding="utf-8", newline="") as f:
+                pointer = csv.writer(f)
+                pointer.writerow(header)
+                pointer.writerows(generate_ledger(200, seed=0))
+            call_command('importdata', raw, bulk=True, clean=True, rejects=os.path.join(directory, 'omitted.csv'), stdout=io.StringIO())
+        expected = summaries()
+        self.assertTrue(all(expected))
+
+        # A deployment upgraded from before the summaries has their tables but no rows
+        self.migrate(('web', '0011_monthlysummary'))
+        for model in [MonthlyRollup, MonthlySummary, ReceivableSnapshot]:
+            model.objects.all().delete()
+        version = data_version()
+        self.migrate(*MigrationExecutor(connection).loader.graph.leaf_nodes())
+        self.assertEqual(summaries(), expected)
+        self.assertGreater(data_version(), version)
@@ -0,0 +1,145 @@
+import time
+import logging
+import functools
+import threading
+import contextlib
+import collections
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Timings collected for the request handled by each thread, see activated
+local = threading.local()
+
+# Running totals of every chart built by this process, keyed by chart name
+totals = collections.OrderedDict()
+totals_lock = threading.Lock()
+
+# Stages of a chart build, in Server-Timing order
+STAGES = ['sql', 'transform', 'serialize']
+
+class ChartTiming:
+    """Queries and seconds spent on each stage of building one chart
+
+    SQL time is measured on the connections of the building thread, transform
+    time is the rest of the time spent in the chart function and serialize
+    time is the time spent turning its figure into components or JSON.
+    """
+
+    def __init__(self, name, queries, sql, transform, serialize):
+        self.name = name
+        self.queries = queries
+        self.sql = sql
+        self.transform = transform
+        self.serialize = serialize
+
+    @property
+    def total(self):
+        return self.sql + self.transform + self.serialize
+
+    def as_dict(self):
+        """Returns the timing with times in milliseconds, for logs and the stats page"""
+        return {'chart': self.name, 'queries': self.queries, **{stage: round(getattr(self, stage) * 1000, 1) for stage in STAGES + ['total']}}
+
+class QueryTimer:
+    """Database execute wrapper counting the queries of connections and the seconds they take"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+@contextlib.contextmanager
+def activated(timings):
+    """Collects the chart timings of the current thread into a list while the block runs"""
+    previous = getattr(local, 'timings', None)
+    local.timings = timings
+    try:
+        yield timings
+    finally:
+        local.timings = previous
+
+@contextlib.contextmanager
+def timed(timer):
+    """Installs a query timer on every database connection of the current thread, the replica included"""
+    with contextlib.ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        yield timer
+
+def active():
+    """Returns the list collecting chart timings for the current thread, or None"""
+    return getattr(local, 'timings', None)
+
+def measure(plot, datasets, serialize):
+    """Returns the serialized output of a plot function, recording the queries and time of each stage"""
+    timer = QueryTimer()
+    with timed(timer):
+        started = time.perf_counter()
+        figure = plot(datasets)
+        built = time.perf_counter()
+        output = serialize(figure)
+        finished = time.perf_counter()
+
+    record(ChartTiming(plot.__name__, timer.queries, timer.seconds, built - started - timer.seconds, finished - built))
+    return output
+
+def record(timing):
+    """Adds a chart timing to the process totals, the active request and the log"""
+    with totals_lock:
+        total = totals.setdefault(timing.name, collections.Counter())
+        total['builds'] += 1
+        total['queries'] += timing.queries
+        for stage in STAGES + ['total']:
+            total[stage] += getattr(timing, stage)
+        total['slowest'] = max(total['slowest'], timing.total)
+
+    if active() is not None:
+        active().append(timing)
+
+    logger.info(
+        "chart=%s queries=%d sql_ms=%.1f transform_ms=%.1f serialize_ms=%.1f",
+        timing.name, timing.queries, timing.sql * 1000, timing.transform * 1000, timing.serialize * 1000,
+        extra={'timing': timing.as_dict()},
+    )
+
+def stats():
+    """Returns the build count, average queries, average milliseconds per stage and slowest build of each chart, slowest first"""
+    with totals_lock:
+        rows = [
+            dict(
+                chart=name,
+                builds=total['builds'],
+                queries=round(total['queries'] / total['builds'], 1),
+                slowest=round(total['slowest'] * 1000, 1),
+                **{stage: round(total[stage] * 1000 / total['builds'], 1) for stage in STAGES + ['total']}
+            )
+            for name, total in totals.items()
+        ]
+    return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+def server_timing(timings, timer, seconds):
+    """Returns a Server-Timing header value for the chart timings of a request, its own queries and its duration"""
+    metrics = ['{}-{};dur={:.1f}'.format(timing.name, stage, getattr(timing, stage) * 1000) for timing in timings for stage in STAGES]
+    metrics.append('db;dur={:.1f};desc="{} queries"'.format(timer.seconds * 1000, timer.queries))
+    metrics.append('total;dur={:.1f}'.format(seconds * 1000))
+    return ', '.join(metrics)
+
+def instrumented(view):
+    """Decorates a view to report the charts it built, its queries and its duration in a Server-Timing header"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with activated([]) as timings, timed(timer):
+            response = view(request, *args, **kwargs)
+        response['Server-Timing'] = server_timing(timings, timer, time.perf_counter() - started)
+        return response
+    return wrapper
@@ -5,6 +5,8 @@ from . import views
 app_name = 'web'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('charts/<str:name>/', views.chart, name='chart'),
+    path('stats/', views.stats, name='stats'),
     path('login/', auth_views.LoginView.as_view(template_name='web/bootstrap_login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 ]
\ No newline at end of file
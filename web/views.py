@@ -1,132 +1,156 @@
-import inspect
+import os
+import json
+import hashlib
+import logging
+import functools
+from django.conf import settings
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.html import format_html
+from django.utils.http import http_date, quote_etag
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from bokeh.embed import components
-from web.charts import *
+from django.views.decorators.gzip import gzip_page
+from web.models import DataVersion
+from web.cache import cached_components, cached_json_item
+from web.datasets import Datasets
+from web.filters import ChartFilter
+from web import registry
+from web.roles import CHARTS, ROLES, resolve_role
+from web.snapshots import current_snapshot, layout
+from web.timing import instrumented, stats as chart_stats
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 @login_required(login_url='web:login')
+@gzip_page
+@instrumented
 def index(request):
-    
-    # Check user group
-    if request.user.groups.filter(name__in=['CHIEF EXECUTIVES']).exists():
-       
-        # Define plots
-        plots = {
-            'plot1': total_income_by_month(),
-            'plot2': total_projects_by_quarter(),
-            'plot3': top_ten_customer_revenue_contribution_of_all_time(),
-            'plot4': top_ten_customer_revenue_contribution_last_twelve_months(),
-            'plot5': income_by_location(),
-            'plot6': revenue_by_salesperson_per_year(),
-            'plot7': accounts_receivables_balance_by_month(),
-            'plot8': accounts_receivables_turnover_by_month(),
-            'plot9': top_ten_accounts_receivables_balance_by_customer(),
-            'plot10': income_by_project_per_year(),
-        }
 
-        # Create components
-        script, div = components(plots)
-
-        # Create containers and headers
-        divlist = [
-            {
-                "plot1": div['plot1'],
-                "plot2": div['plot2'],
-            },
-            {
-                "plot3": div['plot3'],
-                "plot4": div['plot4'],
-            },
-            {
-                "plot5": div['plot5'],
-                "plot6": div['plot6'],
-            },
-            {
-                "plot7": div['plot7'],
-                "plot8": div['plot8'],
-            },
-            {
-                "plot9": div['plot9'],
-                "plot10": div['plot10'],
-            },
-        ]
-
-        # Append to context
-        context = {
-            'bokehjs': script,
-            'bokehdiv': divlist,
-        }
+    # Check user role
+    group = resolve_role(request)
+    if group is None:
+        # Return empty page if not authorised
+        return render(request, 'web/bulma_index.html')
+    rows = ROLES[group]
 
-        return render(request, 'web/bulma_index.html', context=context)
-    
-    elif request.user.groups.filter(name__in=['FINANCE DEPARTMENT']).exists():
-        
-        # Define plots
-        plots = {
-            'plot1': accounts_receivables_balance_by_month(),
-            'plot2': accounts_receivables_turnover_by_month(),
-            'plot3': top_ten_accounts_receivables_balance_by_customer(),
-            'plot4': income_by_project_per_year(),
-        }
+    # Restrict every chart to the filter in the query parameters
+    filters = ChartFilter.from_query(request.GET)
 
-        # Create components
-        script, div = components(plots)
-
-        # Create containers and headers
-        divlist = [
-            {
-                "plot1": div['plot1'],
-                "plot2": div['plot2'],
-            },
-            {
-                "plot3": div['plot3'],
-                "plot4": div['plot4'],
-            },
-        ]
-
-        # Append to context
-        context = {
-            'bokehjs': script,
-            'bokehdiv': divlist,
-        }
+    # Serve the pre-rendered dashboard of the group if it was built from the current data
+    snapshot = None if filters else current_snapshot(group)
 
-        return render(request, 'web/bulma_index.html', context=context)
+    # Answer Not Modified if the browser holds the page for the current data and layout, or the snapshot with the same digest; the page greets the user by name
+    content = [snapshot.digest] if snapshot is not None else [settings.CHART_LAZY_LOADING, registry.layout_key(group)]
+    etag, last_modified = validators(group, request.user.pk, request.user.get_full_name(), *content, filters.key)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = render(request, 'web/bulma_index.html', context=dashboard_context(rows, filters, snapshot))
 
-    elif request.user.groups.filter(name__in=['CUSTOMER SERVICE DEPARTMENT']).exists():
-        
-        # Define plots
-        plots = {
-            'plot1': income_by_location(),
-            'plot2': revenue_by_salesperson_per_year(),
-            'plot3': top_ten_customer_revenue_contribution_of_all_time(),
-            'plot4': top_ten_customer_revenue_contribution_last_twelve_months(),
-        }
+    return revalidated(response, etag, last_modified)
 
-        # Create components
-        script, div = components(plots)
-
-        # Create containers and headers
-        divlist = [
-            {
-                "plot1": div['plot1'],
-                "plot2": div['plot2'],
-            },
-            {
-                "plot3": div['plot3'],
-                "plot4": div['plot4'],
-            },
-        ]
-
-        # Append to context
-        context = {
-            'bokehjs': script,
-            'bokehdiv': divlist,
+def dashboard_context(rows, filters, snapshot=None):
+    """Returns the template context of a dashboard, from its snapshot if one is given"""
+
+    # Serve the pre-rendered dashboard
+    if snapshot is not None:
+        return {
+            'bokehjs': snapshot.script,
+            'bokehdiv': json.loads(snapshot.divs),
+            'lazy': False,
+            'filters': filters,
         }
 
-        return render(request, 'web/bulma_index.html', context=context)
+    # Define plots
+    plots, names = layout(rows)
+    query = '?' + filters.key if filters else ''
 
+    # Create components, or placeholders that fetch each chart once the page has loaded
+    if settings.CHART_LAZY_LOADING:
+        script = ''
+        div = {name: format_html('<div id="{}" data-chart-url="{}"></div>', name, reverse('web:chart', args=[plot.__name__]) + query) for name, plot in plots.items()}
     else:
+        datasets = Datasets(filters)
+        script, div = cached_components(plots, datasets)
+
+        # Log queries shared between charts
+        logger.debug("%d dataset queries saved", datasets.saved)
+
+    # Create containers and headers
+    divlist = [{name: div[name] for name in row} for row in names]
+
+    # Append to context
+    return {
+        'bokehjs': script,
+        'bokehdiv': divlist,
+        'lazy': settings.CHART_LAZY_LOADING,
+        'filters': filters,
+    }
+
+def release():
+    """Returns the RELEASE setting, or a digest of the code and templates of the web app when it is empty"""
+    return settings.RELEASE or source_digest()
+
+@functools.lru_cache(maxsize=None)
+def source_digest():
+    """Returns a digest of the modules and templates of the web app, read once per process"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = [name for name in subdirectories if name not in ['__pycache__', 'migrations']]
+        paths.extend(os.path.join(directory, name) for name in filenames if name.endswith(('.py', '.html')))
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            digest.update(os.path.relpath(path, root).encode('utf-8') + b'\0' + f.read())
+    return digest.hexdigest()
+
+def validators(*parts):
+    """Returns the ETag and Last-Modified time of a response built from the current data, the running release and the given parts"""
+    stamp, updated = DataVersion.objects.filter(pk=1).values_list('stamp', 'updated').first() or (0, None)
+    key = '\x1f'.join(str(part) for part in (stamp, release()) + parts)
+    return quote_etag(hashlib.sha1(key.encode('utf-8')).hexdigest()), updated and int(updated.timestamp())
+
+def revalidated(response, etag, last_modified):
+    """Returns a response carrying its validators, which the browser must revalidate before reusing it"""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-        # Return empty page if not authorised
-        return render(request, 'web/bulma_index.html')
+@login_required(login_url='web:login')
+@gzip_page
+@instrumented
+def chart(request, name):
+
+    # Check the chart is on the dashboard of the user's role
+    plot = CHARTS.get(resolve_role(request), {}).get(name)
+    if plot is None:
+        if not any(name in charts for charts in CHARTS.values()):
+            raise Http404("Chart does not exist")
+        return HttpResponseForbidden()
+
+    filters = ChartFilter.from_query(request.GET)
+
+    # Answer Not Modified if the browser holds the chart for the current data
+    etag, last_modified = validators(name, filters.key)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(cached_json_item(plot, Datasets(filters)))
+
+    return revalidated(response, etag, last_modified)
+
+@staff_member_required(login_url='web:login')
+def stats(request):
+
+    # Chart build timings of this process, slowest first
+    titles = {chart.id: chart.title for chart in registry.REGISTRY}
+    context = {
+        'stats': [dict(row, title=titles.get(row['chart'], row['chart'])) for row in chart_stats()],
+    }
+
+    return render(request, 'web/bulma_stats.html', context=context)